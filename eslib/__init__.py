@@ -1,4 +1,7 @@
 import re
+import operator
+import json
+import hashlib
 
 def join_default(val, default):
     for key, value in default.items():
@@ -29,6 +32,72 @@ def parse_size(input_size, out_suffix="", default_suffix=None):
         return input_size
 
 
+where_re = re.compile(r'^\s*([-\w.@]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$')
+where_operators = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '!=': operator.ne,
+    '=': operator.eq,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+def _where_value(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def parse_where(expression):
+    """
+    Parse conditions like 'count>50,deleted_docs>0', all of them must be true. Returns a function that checks a
+    dict of values, a missing value fails the condition.
+    """
+    conditions = []
+    for condition in expression.split(','):
+        matcher = where_re.match(condition)
+        if matcher is None:
+            raise ValueError("invalid condition '%s'" % condition)
+        conditions.append((matcher.group(1), where_operators[matcher.group(2)], _where_value(matcher.group(3))))
+
+    def check(values):
+        for (name, op, expected) in conditions:
+            if name not in values:
+                return False
+            value = _where_value(values[name])
+            if type(value) != type(expected):
+                value, expected = str(values[name]), str(expected)
+            if not op(value, expected):
+                return False
+        return True
+    return check
+
+
+def normalize(value):
+    """
+    Scalars written as strings, as Elasticsearch often returns them, so a value read from a file can be compared with
+    the one returned
+    """
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [normalize(v) for v in value]
+    elif isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif value is None:
+        return None
+    else:
+        return str(value)
+
+
+def structural_hash(value):
+    """
+    A hash of a document that doesn't depend on the order of the keys or on how scalars are written
+    """
+    return hashlib.sha1(json.dumps(normalize(value), sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
 def create_re():
     re_elements = []
     for count in (8, 4, 4, 4, 12):
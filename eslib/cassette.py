@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from asyncio import sleep
+from urllib.parse import urlencode
+from elasticsearch.connection import Connection
+from elasticsearch.exceptions import HTTP_EXCEPTIONS, ConnectionError, TransportError
+from eslib.exceptions import ESLibError
+from eslib.pycurlconnection import PyCurlConnection
+
+
+def request_key(method, url, params=None, body=None):
+    """
+    Identify a request by its method, path, sorted parameters and a digest of its body
+    """
+    if params:
+        url = '%s?%s' % (url, urlencode(sorted((k, v.decode('utf-8') if isinstance(v, bytes) else v) for (k, v) in params.items())))
+    key = '%s %s' % (method, url)
+    if body is not None:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key += ' %s' % hashlib.sha1(body).hexdigest()[0:12]
+    return key
+
+
+class Cassette(object):
+    """
+    The responses to requests, stored in a gzip compressed json file. Identical responses are only stored once, a
+    request that was sent many times keeps its responses in order.
+    """
+
+    def __init__(self, file_name, load=False):
+        self.file_name = file_name
+        self.requests = {}
+        self.responses = []
+        self.indexes = {}
+        # The next response to serve for each request
+        self.positions = {}
+        if load:
+            try:
+                with gzip.open(file_name, 'rt', encoding='utf-8') as cassette_file:
+                    content = json.load(cassette_file)
+            except (OSError, ValueError) as e:
+                raise ESLibError('unusable cassette %s: %s' % (file_name, e))
+            self.requests = content['requests']
+            self.responses = content['responses']
+
+    def record(self, key, response):
+        serialized = json.dumps(response, separators=(',', ':'))
+        index = self.indexes.get(serialized)
+        if index is None:
+            index = len(self.responses)
+            self.indexes[serialized] = index
+            # A copy, the exceptions recorded can be modified later
+            self.responses.append(json.loads(serialized))
+        self.requests.setdefault(key, []).append(index)
+
+    def next(self, key):
+        """
+        The next response recorded for a request, the last one is repeated
+        """
+        indexes = self.requests.get(key)
+        if indexes is None:
+            raise ESLibError('not in the cassette %s: %s' % (self.file_name, key))
+        position = self.positions.get(key, 0)
+        self.positions[key] = position + 1
+        return self.responses[indexes[min(position, len(indexes) - 1)]]
+
+    def save(self):
+        tmp_name = '%s.%d.tmp' % (self.file_name, os.getpid())
+        with gzip.open(tmp_name, 'wt', encoding='utf-8') as cassette_file:
+            json.dump({'requests': self.requests, 'responses': self.responses}, cassette_file, separators=(',', ':'))
+        os.replace(tmp_name, self.file_name)
+
+
+class RecordingConnection(PyCurlConnection):
+    """
+    A pycurl connection that records the responses in a cassette
+    """
+
+    def __init__(self, cassette=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    async def perform_request(self, method, url, params=None, body=None, headers={}, ignore=(), future=None, timeout=None):
+        key = request_key(method, url, params, body)
+        await super().perform_request(method, url, params=params, body=body, headers=headers, ignore=ignore,
+                                      future=future, timeout=timeout)
+        if future.cancelled():
+            return future
+        ex = future.exception()
+        if ex is None:
+            (status, headers_out, data) = future.result()
+            self.cassette.record(key, [status, headers_out.get('content-type'), data])
+        elif isinstance(ex, TransportError) and isinstance(ex.status_code, int):
+            self.cassette.record(key, [ex.status_code, None, list(ex.args)])
+        else:
+            self.cassette.record(key, [None, None, str(ex)])
+        return future
+
+
+class ReplayConnection(Connection):
+    """
+    A connection that serves the responses of a cassette. Each one is delayed by latency, and the responses share a
+    link of bandwidth bytes/s, so the concurrency of a command is simulated
+    """
+
+    def __init__(self, cassette=None, multi_handle=None, latency=0.0, bandwidth=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.multi_handle = multi_handle
+        self.latency = float(latency or 0.0)
+        self.bandwidth = None if bandwidth is None else float(bandwidth)
+        # When the simulated link will be done with the responses already sent
+        self.link_free = 0.0
+
+    async def perform_request(self, method, url, params=None, body=None, headers={}, ignore=(), future=None, timeout=None):
+        try:
+            (status, content_type, data) = self.cassette.next(request_key(method, url, params, body))
+        except ESLibError as e:
+            future.set_exception(e)
+            return future
+        size = len(data) if isinstance(data, str) else 0
+        delay = self.latency
+        if self.bandwidth is not None:
+            now = time.monotonic()
+            self.link_free = max(now, self.link_free) + size / self.bandwidth
+            delay += self.link_free - now
+        if delay > 0:
+            await sleep(delay)
+        self.multi_handle.count(method, url, 0 if body is None else len(body), size)
+        if status is None:
+            future.set_exception(ConnectionError('N/A', data, None))
+        elif status >= 300:
+            future.set_exception(HTTP_EXCEPTIONS.get(status, TransportError)(*data))
+        else:
+            future.set_result((status, {} if content_type is None else {'content-type': content_type}, data))
+        return future
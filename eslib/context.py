@@ -2,7 +2,7 @@ from configparser import ConfigParser
 from elasticsearch import Elasticsearch
 from eslib.asynctransport import AsyncTransport
 from eslib.exceptions import resolve_exception
-from asyncio import create_task, ensure_future, wait, FIRST_COMPLETED
+from asyncio import ensure_future, wait, all_tasks, FIRST_COMPLETED
 import copy
 import urllib.parse
 from enum import Enum
@@ -37,10 +37,10 @@ class ConfigurationError(Exception):
 
 class Context(object):
     # The settings that store boolean values
-    boolean_options = {'api': frozenset(['debug', 'kerberos', 'sniff']), 'logging': {}, 'kerberos': {}, 'ssl': frozenset(['verify_certs']), 'pycurl': {}}
+    boolean_options = {'api': frozenset(['debug', 'kerberos', 'sniff', 'ordered', 'progress', 'plan']), 'logging': {}, 'kerberos': {}, 'ssl': frozenset(['verify_certs']), 'pycurl': {}, 'ratelimit': {}}
 
     # The settings that store integer values
-    integer_options = {'api': frozenset(['timeout', 'maxactive']), 'logging': {}, 'kerberos': {}, 'ssl': {}, 'pycurl': {}}
+    integer_options = {'api': frozenset(['timeout', 'maxactive', 'in_flight']), 'logging': {}, 'kerberos': {}, 'ssl': {}, 'pycurl': {}, 'ratelimit': {}}
 
     # mapping from command line options to configuration options:
     arg_options = {'debug': ['api', 'debug'],
@@ -56,6 +56,17 @@ class Context(object):
                    'maxactive': ['api', 'maxactive'],
                    'impersonate': ['api', 'impersonate'],
                    'bearer_token': ['api', 'bearer_token'],
+                   'ordered': ['api', 'ordered'],
+                   'in_flight': ['api', 'in_flight'],
+                   'journal': ['api', 'journal'],
+                   'progress': ['api', 'progress'],
+                   'plan': ['api', 'plan'],
+                   'history': ['api', 'history'],
+                   'offline': ['api', 'offline'],
+                   'record': ['api', 'record'],
+                   'replay': ['api', 'replay'],
+                   'replay_latency': ['api', 'replay_latency'],
+                   'replay_bandwidth': ['api', 'replay_bandwidth'],
                    }
 
     # default values for connection
@@ -79,6 +90,17 @@ class Context(object):
             'impersonate': None,
             'bearer_token': None,
             'bearer_token_file': None,
+            'ordered': False,
+            'in_flight': None,
+            'journal': None,
+            'progress': False,
+            'plan': False,
+            'history': None,
+            'offline': None,
+            'record': None,
+            'replay': None,
+            'replay_latency': 0.0,
+            'replay_bandwidth': None,
         },
         'logging': {
             'filters': 'header,data,text',
@@ -101,12 +123,22 @@ class Context(object):
         'pycurl': {
             'libcurl_path': None,
             'pycurl_path': None
+        },
+        # The rate of the requests that update the cluster state, by endpoint class
+        'ratelimit': {
         }
     }
 
     def __init__(self, config_file=None, **kwargs):
         super(Context, self).__init__()
         self.connected = False
+        self._journal = None
+        self._plan = None
+        self._history = None
+        self._bundle = None
+        self._cassette = None
+        # The progress of the running RepeterVerb, if reported
+        self.progress_reporter = None
 
         # Check consistency of authentication setup
         explicit_user = 'password' in kwargs or 'passwordfile' in kwargs or 'username' in kwargs
@@ -191,14 +223,24 @@ class Context(object):
         if self.current_config['api']['username'] is None and self.current_config['api']['kerberos'] is None:
             raise ConfigurationError('not enough authentication informations')
 
-        if self.current_config['api']['connection_class'] == None:
+        if self.current_config['api']['offline'] is not None:
+            from eslib.offline import OfflineConnection
+            self.current_config['api']['connection_class'] = OfflineConnection
+        elif self.current_config['api']['connection_class'] == None:
             self.check_pycurl(**self.current_config['pycurl'])
 
             from eslib.pycurlconnection import PyCurlConnection, http_versions, version_info
             from eslib.curldebug import CurlDebugType
-            self.current_config['api']['connection_class'] = PyCurlConnection
+            if self.current_config['api']['replay'] is not None:
+                from eslib.cassette import ReplayConnection
+                self.current_config['api']['connection_class'] = ReplayConnection
+            elif self.current_config['api']['record'] is not None:
+                from eslib.cassette import RecordingConnection
+                self.current_config['api']['connection_class'] = RecordingConnection
+            else:
+                self.current_config['api']['connection_class'] = PyCurlConnection
 
-        if str(self.current_config['api']['connection_class'].__name__) == 'PyCurlConnection':
+        if str(self.current_config['api']['connection_class'].__name__) in ('PyCurlConnection', 'RecordingConnection'):
             if self.current_config['logging']['filters'] is not None and self.current_config['api']['debug']:
                 self.filter = 0
                 filters = [x.strip() for x in self.current_config['logging']['filters'].split(',')]
@@ -242,14 +284,28 @@ class Context(object):
             self.curl_perform_task = parent.curl_perform_task
             self.loop = parent.loop
         else:
-            from eslib.pycurlconnection import PyCurlMultiHander
             import asyncio
             self.loop = asyncio.get_event_loop()
-            self.multi_handle = PyCurlMultiHander(self.current_config['api']['maxactive'], loop=self.loop)
+            self.multi_handle = None
             self.curl_perform_task = None
+            if self.bundle is not None or self.current_config['api']['replay'] is not None:
+                from eslib.offline import LocalHandler
+                self.multi_handle = LocalHandler(loop=self.loop)
+            else:
+                from eslib.pycurlconnection import PyCurlMultiHander
+                self.multi_handle = PyCurlMultiHander(self.current_config['api']['maxactive'], loop=self.loop)
 
         cnxprops={'multi_handle': self.multi_handle,
                   'timeout': self.current_config['api']['timeout']}
+        if self.bundle is not None:
+            cnxprops['bundle'] = self.bundle
+        if self.cassette is not None:
+            cnxprops['cassette'] = self.cassette
+        if self.current_config['api']['replay'] is not None:
+            cnxprops.update({
+                'latency': self.current_config['api']['replay_latency'],
+                'bandwidth': self.current_config['api']['replay_bandwidth'],
+            })
         if self.current_config['api']['debug']:
             cnxprops.update({
                 'debug': self.current_config['api']['debug'],
@@ -308,6 +364,14 @@ class Context(object):
                                    kerberos=self.current_config['api']['kerberos'],
                                    http_auth=http_auth,
                                    **cnxprops)
+        if self.history is not None:
+            self.multi_handle.history = self.history
+        if len(self.current_config['ratelimit']) > 0:
+            from eslib.ratelimit import RateLimitTransport
+            self.escnx.transport = RateLimitTransport(self.escnx.transport, self.current_config['ratelimit'])
+        if self.plan is not None:
+            from eslib.plan import PlanTransport
+            self.escnx.transport = PlanTransport(self.escnx.transport, self.plan)
         if self.curl_perform_task is None:
             self.curl_perform_task = ensure_future(self.multi_handle.perform())
         if parent is None:
@@ -316,11 +380,22 @@ class Context(object):
             return True
 
     def perform_query(self, query):
+        query_task = self.loop.create_task(query)
+
         async def looper():
-            done, pending = await wait((create_task(query), self.curl_perform_task), return_when=FIRST_COMPLETED)
+            done, pending = await wait((query_task, self.curl_perform_task), return_when=FIRST_COMPLETED)
             return done, pending
 
-        done, pending = self.loop.run_until_complete(looper())
+        try:
+            done, pending = self.loop.run_until_complete(looper())
+        except KeyboardInterrupt:
+            # Let the queries cancel their pending requests before giving up
+            tasks = [t for t in all_tasks(self.loop) if t is not self.curl_perform_task and not t.done()]
+            for t in tasks:
+                t.cancel()
+            if len(tasks) > 0:
+                self.loop.run_until_complete(wait(tasks))
+            raise
         # done contain either a result/exception from run_phrase or an exception from multi_handle.perform()
         # In both case, the first result is sufficient
         for i in done:
@@ -334,15 +409,81 @@ class Context(object):
                 return running
 
     def disconnect(self):
+        if self.loop is not None and self.multi_handle is None:
+            self.loop.close()
+            self.loop = None
         if self.loop is not None:
             self.multi_handle.running = False
-            self.loop.run_until_complete(self.curl_perform_task)
+            # An interrupted curl loop is already finished
+            if not self.curl_perform_task.done():
+                self.loop.run_until_complete(self.curl_perform_task)
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
             self.loop.stop()
             self.loop.close()
             self.loop = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._history is not None:
+            self._history.save()
+            self._history = None
+        if self._cassette is not None:
+            if self.current_config['api']['replay'] is None:
+                self._cassette.save()
+            self._cassette = None
         self.escnx = None
         self.connected = False
 
     @property
     def timeout(self):
         return self.current_config['api']['timeout']
+
+    @property
+    def ordered(self):
+        return self.current_config['api']['ordered']
+
+    @property
+    def in_flight(self):
+        return self.current_config['api']['in_flight']
+
+    @property
+    def progress(self):
+        return self.current_config['api']['progress']
+
+    @property
+    def bundle(self):
+        if self._bundle is None and self.current_config['api']['offline'] is not None:
+            from eslib.offline import Bundle
+            self._bundle = Bundle(self.current_config['api']['offline'])
+        return self._bundle
+
+    @property
+    def cassette(self):
+        if self._cassette is None and self.current_config['api']['replay'] is not None:
+            from eslib.cassette import Cassette
+            self._cassette = Cassette(self.current_config['api']['replay'], load=True)
+        elif self._cassette is None and self.current_config['api']['record'] is not None:
+            from eslib.cassette import Cassette
+            self._cassette = Cassette(self.current_config['api']['record'])
+        return self._cassette
+
+    @property
+    def history(self):
+        if self._history is None and self.current_config['api']['history'] is not None:
+            from eslib.plan import History
+            self._history = History(self.current_config['api']['history'])
+        return self._history
+
+    @property
+    def plan(self):
+        if self._plan is None and self.current_config['api']['plan']:
+            from eslib.plan import Plan
+            self._plan = Plan(self.history)
+        return self._plan
+
+    @property
+    def journal(self):
+        if self._journal is None and self.current_config['api']['journal'] is not None:
+            from eslib.journal import Journal
+            self._journal = Journal(self.current_config['api']['journal'])
+        return self._journal
@@ -1,6 +1,9 @@
+from inspect import isasyncgen, isawaitable
 from eslib.exceptions import ESLibError
-from eslib import dispatchers, join_default
+from eslib import dispatchers, join_default, parse_where
 from eslib.running import Running
+from eslib.plan import PlannedRequest
+from eslib.verb import RepeterVerb
 
 
 def command(dispatcher_class, verb=None):
@@ -12,10 +15,12 @@ def command(dispatcher_class, verb=None):
     return decorator
 
 
-def dispatcher(object_name, default_filter_path=None):
+def dispatcher(object_name, default_filter_path=None, element_filter_path=None):
     def decorator(dispatcher_class):
         dispatcher_class.object_name = object_name
         dispatcher_class.default_filter_path = default_filter_path
+        # The filter_path matching each element in the response of get, used to select only some attributes
+        dispatcher_class.element_filter_path = element_filter_path
         setattr(dispatcher_class, 'verbs', {})
         dispatchers[object_name] = dispatcher_class
 
@@ -61,7 +66,54 @@ class Dispatcher(object):
         return {k: v for k, v in list(vars(options).items())
                         if v is not None and (isinstance(v, str) or not hasattr(v, '__len__') or len(v) != 0)}
 
-    async def run_phrase(self, verb, object_options={}, object_args=[]):
+    async def upstream_object(self, running, elements):
+        """
+        Build the object of a phrase from the elements of the previous one in a pipeline
+        """
+        return dict(elements)
+
+    async def run_pipeline(self, phrases, object_options={}):
+        """
+        Run phrases given as (verb, args, where), each one using the (element, result) of the previous one as its
+        elements. Only the first phrase gets the object from the cluster.
+        """
+        checks = []
+        for (_, _, where) in phrases:
+            try:
+                checks.append(parse_where(where) if where is not None else None)
+            except ValueError as e:
+                raise ESLibError(str(e))
+        running = None
+        for (i, (verb, object_args, _)) in enumerate(phrases):
+            running = await self.run_phrase(verb, object_options, object_args, upstream=running)
+            if running is None:
+                return None
+            if (checks[i] is not None or i < len(phrases) - 1) and not self._streamed(running):
+                raise ESLibError("the output of '%s %s' can't be filtered or piped" % (self.object_name, running.cmd.verb))
+            if checks[i] is not None:
+                running.result = self._where(running, running.result, checks[i])
+        return running
+
+    def _streamed(self, running):
+        return isinstance(running.cmd, RepeterVerb) and isasyncgen(running.result)
+
+    async def _where(self, running, result, check):
+        async for item in result:
+            if isinstance(item, (Exception, str)) or check(running.cmd.where_values(running, item[0], item[1])):
+                yield item
+
+    async def _upstream_elements(self, upstream, cmd):
+        # Exceptions are not elements, they are given back as is
+        async for item in upstream.result:
+            if isinstance(item, Exception):
+                yield item
+            elif isinstance(item, str):
+                # The summary of the previous phrase is not an element
+                continue
+            else:
+                yield cmd.upstream_element(upstream.cmd.element_name(item[0]), item[1])
+
+    async def run_phrase(self, verb, object_options={}, object_args=[], upstream=None):
         cmd = self.get_cmd(verb)
         running = Running(cmd)
         if cmd is None:
@@ -71,12 +123,51 @@ class Dispatcher(object):
         except SystemExit:
             return None
         verb_options = self.clean_options(verb_options)
+        running.verb_args = tuple(object_args)
         nounargs = cmd.check_noun_args(running, **object_options)
         verbargs = cmd.check_verb_args(running, *verb_args, **verb_options)
-        running.object = await cmd.get(running, **nounargs)
-        running.result = await cmd.execute(running, **verbargs)
+        if upstream is None:
+            running.object = await self._resolve(cmd.get(running, **nounargs))
+        elif isinstance(cmd, RepeterVerb):
+            running.upstream = self._upstream_elements(upstream, cmd)
+        else:
+            # A single action for all the elements, so they are all needed
+            elements = []
+            errors = []
+            async for item in self._upstream_elements(upstream, cmd):
+                if isinstance(item, Exception):
+                    errors.append(item)
+                else:
+                    elements.append(item)
+            running.object = await self.upstream_object(running, elements)
+            running.result = self._after_errors(running, errors, verbargs)
+            return running
+        try:
+            running.result = await self._resolve(cmd.execute(running, **verbargs))
+        except PlannedRequest:
+            # With --plan, the request of a single action is only recorded
+            running.result = None
         return running
 
+    async def _resolve(self, value):
+        # get and execute can be coroutines or asynchronous generators, that are consumed later
+        if isawaitable(value):
+            return await value
+        else:
+            return value
+
+    async def _after_errors(self, running, errors, verbargs):
+        for ex in errors:
+            yield ex
+        # Nothing to do if the previous phrase gave no elements
+        if len(running.object) > 0:
+            result = await self._resolve(running.cmd.execute(running, **verbargs))
+            if isasyncgen(result):
+                async for item in result:
+                    yield item
+            else:
+                yield result
+
 
 
 
@@ -99,5 +99,8 @@ class DocumentsList(RepeterVerb):
     def to_str(self, running, item):
         return "%s" % (item.keys())
 
+    def result_is_valid(self, result):
+        return not isinstance(result, Exception)
+
     async def action(self, element, running):
         return element
@@ -5,7 +5,7 @@ import sys
 import optparse
 import eslib
 import codecs
-from inspect import isgenerator
+from inspect import isgenerator, isasyncgen
 from traceback import print_exception
 from eslib.context import Context, ConfigurationError
 import elasticsearch.exceptions
@@ -19,33 +19,80 @@ def safe_print(string):
     print(decoded)
 
 
-def filter_result(cmd, running, result):
+async def filter_result(cmd, running, result):
     if isinstance(result, str):
+        if cmd.api.progress_reporter is not None:
+            cmd.api.progress_reporter.clear()
         safe_print(result)
     elif isgenerator(result):
         # If execute return a generator, iterate other it
         for s in result:
-            if isinstance(s, ESLibError):
-                print(s, file=sys.stderr)
-            elif isinstance(s, Exception):
-                if hasattr(s, 'source'):
-                    print('Exception from source "%s":' % s.source, file=sys.stderr)
-                print_exception(type(s), s, s.__traceback__, file=sys.stderr)
-            elif s is not None:
-                filter_result(cmd, running, s)
+            await filter_item(cmd, running, s)
+    elif isasyncgen(result):
+        # Results are printed as soon as they are available, the next one is read only once printed
+        async for s in result:
+            await filter_item(cmd, running, s)
     elif result is not None and result is not False:
         # Else if it returns something, just print it
-        filter_result(cmd, running, cmd.to_str(running, result))
+        await filter_result(cmd, running, cmd.to_str(running, result))
     elif result is not None:
         # It return false, something went wrong
         raise ESLibError("'%s %s' failed" % (result.object_name, cmd.verb))
 
 
+async def filter_item(cmd, running, item):
+    if isinstance(item, ESLibError):
+        print(item, file=sys.stderr)
+    elif isinstance(item, Exception):
+        if hasattr(item, 'source'):
+            print('Exception from source "%s":' % item.source, file=sys.stderr)
+        print_exception(type(item), item, item.__traceback__, file=sys.stderr)
+    elif item is not None:
+        await filter_result(cmd, running, item)
+
+
 def print_run_phrase(dispatcher, verb, object_options={}, object_args=[]):
     query = dispatcher.run_phrase(verb, object_options, object_args)
-    running = dispatcher.api.perform_query(query)
+    print_running(dispatcher, dispatcher.api.perform_query(query))
+
+
+def print_run_pipeline(dispatcher, phrases, object_options={}):
+    query = dispatcher.run_pipeline(phrases, object_options)
+    print_running(dispatcher, dispatcher.api.perform_query(query))
+
+
+def print_running(dispatcher, running):
     if running is not None:
-        filter_result(running.cmd, running, running.result)
+        dispatcher.api.perform_query(filter_result(running.cmd, running, running.result))
+
+
+def split_pipeline(args):
+    """
+    Split the verbs and their arguments on '|', and extract the --where option of each of them
+    """
+    phrases = []
+    current = []
+    for arg in args + ['|']:
+        if arg != '|':
+            current.append(arg)
+            continue
+        if len(current) == 0:
+            raise ConfigurationError('empty phrase in pipeline')
+        where = None
+        verb_args = []
+        args_iter = iter(current[1:])
+        for verb_arg in args_iter:
+            if verb_arg == '--where':
+                where = next(args_iter, None)
+                if where is None:
+                    raise ConfigurationError('--where needs a condition')
+            elif verb_arg.startswith('--where='):
+                where = verb_arg[8:]
+            else:
+                verb_args.append(verb_arg)
+        phrases.append((current[0], verb_args, where))
+        current = []
+    return phrases
 
 
 # needed because dict.update is using shortcuts and don't works on subclass of dict
@@ -61,7 +108,7 @@ usage_common = "usage: %prog [options] object [object_args] verb [verbs_args]"
 
 def get_parser(default_config=None):
     # The first level parser
-    parser = optparse.OptionParser(usage="%s\nobjects are:\n    %s" % (usage_common, "\n    ".join(list(eslib.dispatchers.keys()))))
+    parser = optparse.OptionParser(usage="%s\nobjects are:\n    %s" % (usage_common, "\n    ".join(list(eslib.dispatchers.keys()) + ['snapshot-state'])))
     parser.disable_interspersed_args()
     parser.add_option("-c", "--config", dest="config_file", help="an alternative config file", default=default_config)
     parser.add_option("-d", "--debug", dest="debug", help="The debug level", action="store_true")
@@ -75,9 +122,43 @@ def get_parser(default_config=None):
     parser.add_option("-i", "--impersonate", dest="impersonate", help="Impersonate as (for SearchGuard)", default=None)
     parser.add_option("--token", dest="bearer_token", help="Authenticate using a bearer token", default=None)
     parser.add_option("--token_file", dest="bearer_token_file", help="Authenticate using a bearer token", default=None)
+    parser.add_option("--inflight", dest="in_flight", help="How many actions on objects can be running at the same time", default=None, type=int)
+    parser.add_option("--journal", dest="journal", help="Record the done elements in that file, and skip them when run again", default=None)
+    parser.add_option("--progress", dest="progress", help="Report the progress of actions on objects on stderr", default=None, action='store_true')
+    parser.add_option("--plan", dest="plan", help="Only show the requests that would be sent to act on objects", default=None, action='store_true')
+    parser.add_option("--history", dest="history", help="Keep the size of the responses in that file, to estimate the size of planned requests", default=None)
+    parser.add_option("--offline", dest="offline", help="Read the responses from a bundle written by snapshot-state, instead of the cluster", default=None)
+    parser.add_option("--record", dest="record", help="Record the responses in that cassette file", default=None)
+    parser.add_option("--replay", dest="replay", help="Serve the responses recorded in that cassette file, instead of the cluster", default=None)
+    parser.add_option("--replay_latency", dest="replay_latency", help="The simulated latency of replayed responses, in seconds", default=None, type=float)
+    parser.add_option("--replay_bandwidth", dest="replay_bandwidth", help="The simulated bandwidth of replayed responses, in bytes/s", default=None, type=float)
+    parser.add_option("--ordered", dest="ordered", help="Keep the output in the same order than the objects", default=None, action='store_true')
     return parser
 
 
+def snapshot_state(context, args):
+    """
+    Capture the state of the cluster in a file, that can be used later with --offline
+    """
+    from eslib.offline import snapshot
+    parser = optparse.OptionParser(usage="usage: %prog [options] snapshot-state -o FILE")
+    parser.add_option("-o", "--output", dest="output", help="The file where the state is written", default=None)
+    (options, args) = parser.parse_args(args)
+    if options.output is None:
+        print('output file missing', file=sys.stderr)
+        return 253
+    try:
+        context.connect()
+        captured = context.perform_query(snapshot(context.escnx.transport, options.output, context.current_config['api']['url']))
+        print('%d responses written to %s' % (captured, options.output), file=sys.stderr)
+        return 0
+    except elasticsearch.exceptions.ConnectionError as e:
+        print("Failed to connect: ", e.error, file=sys.stderr)
+        return 251
+    finally:
+        context.disconnect()
+
+
 def main():
     default_config = None
     if 'ESCONFIG' in os.environ:
@@ -97,7 +178,9 @@ def main():
         #A object is found try to resolve the verb
 
         object_name = args.pop(0)
-        if object_name in eslib.dispatchers:
+        if object_name == 'snapshot-state':
+            return snapshot_state(context, args)
+        elif object_name in eslib.dispatchers:
             dispatcher = eslib.dispatchers[object_name]()
         else:
             print(('unknown object: %s' % object_name), file=sys.stderr)
@@ -111,7 +194,12 @@ def main():
         (object_options, object_args) = parser_object.parse_args(args)
 
         if len(object_args) > 0:
-            verb = object_args.pop(0)
+            verb = object_args[0]
+            try:
+                phrases = split_pipeline(object_args)
+            except ConfigurationError as e:
+                print(e.error_message, file=sys.stderr)
+                return 253
             try:
                 context.connect()
                 dispatcher.api = context
@@ -121,7 +209,13 @@ def main():
                         del object_options[k]
 
                 # run the found command and print the result
-                print_run_phrase(dispatcher, verb, object_options, object_args)
+                if len(phrases) == 1 and phrases[0][2] is None:
+                    print_run_phrase(dispatcher, verb, object_options, object_args[1:])
+                else:
+                    print_run_pipeline(dispatcher, phrases, object_options)
+                if context.plan is not None:
+                    for line in context.plan.lines():
+                        safe_print(line)
                 return 0
             except elasticsearch.exceptions.ConnectionError as e:
                 print("Failed to connect: ", e.error, file=sys.stderr)
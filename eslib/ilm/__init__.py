@@ -1,5 +1,8 @@
+import heapq
+import time
+from asyncio import gather, Semaphore
 from eslib.dispatcher import dispatcher, Dispatcher, command
-from eslib.verb import DumpVerb, List
+from eslib.verb import Verb, DumpVerb, List
 
 
 @dispatcher(object_name="ilm")
@@ -35,6 +38,94 @@ class IlmList(List):
     def to_str(self, running, item):
         return item[0]
 
+@command(IlmDispatcher, verb='report')
+class IlmReport(Verb):
+    """
+    Counts the managed indices by policy, phase, action and step, and the errors by reason. The indices waiting the
+    longest in each step are given. The indices are resolved first, and explained by chunks of names.
+    """
+    # How many explain requests can be running at the same time, can be overridden with the --inflight option
+    in_flight = 8
+    # The maximum length of the comma separated list of index names of an explain request
+    max_url_length = 3000
+    explain_filter_path = ','.join('indices.*.%s' % i for i in ('policy', 'phase', 'action', 'step', 'step_time_millis', 'failed_step', 'step_info.type', 'step_info.reason'))
+
+    def fill_parser(self, parser):
+        super().fill_parser(parser)
+        parser.add_option("-p", "--pattern", dest="patterns", help="The indices to explain", default=None, action='append')
+        parser.add_option("-s", "--stuck", dest="stuck", help="How many of the indices waiting the longest to give for each step", default=5, type=int)
+        parser.add_option("-e", "--errors_file", dest="errors_file", help="Write the names of the indices in error in that file", default=None)
+
+    def check_verb_args(self, running, *args, patterns=None, stuck=5, errors_file=None, **kwargs):
+        running.patterns = patterns if patterns is not None else ['*']
+        running.stuck = stuck
+        running.errors_file = errors_file
+        return super().check_verb_args(running, *args, **kwargs)
+
+    async def get(self, running, **kwargs):
+        return {}
+
+    async def index_names(self, running):
+        indices = await self.api.escnx.indices.get(index=','.join(running.patterns), filter_path='*.settings.index.uuid')
+        return sorted(indices.keys())
+
+    def chunks(self, names):
+        chunk = []
+        length = 0
+        for name in names:
+            if len(chunk) > 0 and length + len(name) + 1 > self.max_url_length:
+                yield chunk
+                chunk = []
+                length = 0
+            chunk.append(name)
+            length += len(name) + 1
+        if len(chunk) > 0:
+            yield chunk
+
+    async def explain(self, running, names, report):
+        response = await self.api.escnx.ilm.explain_lifecycle(index=','.join(names), only_managed=True, filter_path=self.explain_filter_path)
+        # Only the aggregates are kept, so only the responses being read are in memory
+        now = time.time() * 1000
+        for (index, ilm) in response.get('indices', {}).items():
+            step = (ilm.get('policy'), ilm.get('phase'), ilm.get('action'), ilm.get('step'))
+            report['steps'][step] = report['steps'].get(step, 0) + 1
+            waiting = (now - ilm.get('step_time_millis', now), index)
+            stuck = report['stuck'].setdefault(step, [])
+            if len(stuck) < running.stuck:
+                heapq.heappush(stuck, waiting)
+            elif running.stuck > 0:
+                heapq.heappushpop(stuck, waiting)
+            if ilm.get('step') == 'ERROR':
+                step_info = ilm.get('step_info', {})
+                reason = step_info.get('reason', step_info.get('type', 'unknown'))
+                report['errors'][reason] = report['errors'].get(reason, 0) + 1
+                report['failed'].append(index)
+
+    async def execute(self, running, **kwargs):
+        report = {'steps': {}, 'stuck': {}, 'errors': {}, 'failed': []}
+        slots = Semaphore(self.in_flight if self.api.in_flight is None else max(1, self.api.in_flight))
+
+        async def explain(names):
+            async with slots:
+                await self.explain(running, names, report)
+        await gather(*[explain(names) for names in self.chunks(await self.index_names(running))])
+        if running.errors_file is not None:
+            with open(running.errors_file, 'w') as errors_file:
+                for index in sorted(report['failed']):
+                    errors_file.write(index + '\n')
+        return report
+
+    def to_str(self, running, report):
+        for (step, count) in sorted(report['steps'].items(), key=lambda x: tuple(str(i) for i in x[0])):
+            yield '%s: %d' % (' '.join(str(i) for i in step), count)
+            for (waiting, index) in sorted(report['stuck'].get(step, []), reverse=True):
+                yield '    %s %.1fh' % (index, waiting / 3600000)
+        if len(report['errors']) > 0:
+            yield 'errors:'
+            for (reason, count) in sorted(report['errors'].items(), key=lambda x: -x[1]):
+                yield '    %d %s' % (count, reason)
+
+
 @command(IlmDispatcher, verb='stop')
 class IlmStop(DumpVerb):
 
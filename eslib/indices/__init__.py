@@ -1,13 +1,19 @@
 import json
+import os
+import time
 
 from eslib.context import TypeHandling
-from eslib.verb import Verb, DumpVerb, RepeterVerb, ReadSettings, WriteSettings, CatVerb, List
+from eslib.verb import Verb, DumpVerb, RepeterVerb, BatchedUpdate, ReadSettings, WriteSettings, CatVerb, List
 from eslib.dispatcher import dispatcher, command, Dispatcher
 from eslib.exceptions import ESLibError
- 
+from eslib import normalize, structural_hash
+from eslib.ratelimit import wait_pending_tasks
+
 from json import dumps
 from elasticsearch.exceptions import NotFoundError, ElasticsearchException, RequestError
 import re
+from asyncio import Lock, sleep
+from collections.abc import Mapping
 from yaml import load
 try:
     from yaml import CLoader as Loader
@@ -15,7 +21,7 @@ except ImportError:
     from yaml import Loader
 
 
-@dispatcher(object_name="index", default_filter_path='*.settings.index.uuid')
+@dispatcher(object_name="index", default_filter_path='*.settings.index.uuid', element_filter_path='*')
 class IndicesDispatcher(Dispatcher):
 
     def fill_parser(self, parser):
@@ -28,6 +34,11 @@ class IndicesDispatcher(Dispatcher):
         running.index_name = index_name
         return super().check_noun_args(running, index_name=index_name, **kwargs)
 
+    async def upstream_object(self, running, elements):
+        # Verbs working on the whole object use the index name
+        running.index_name = ','.join(name for (name, _) in elements)
+        return await super().upstream_object(running, elements)
+
     async def get(self, running, index_name='_all', expand_wildcards=None, allow_no_indices=None, ignore_unavailable=None, filter_path='*'):
         if expand_wildcards:
             expand_wildcards= 'all'
@@ -41,6 +52,7 @@ class IndicesDispatcher(Dispatcher):
 
 @command(IndicesDispatcher, verb='list')
 class IndiciesList(List):
+    batched = True
 
     template_human = lambda self, x, y: "%s\t%12d\t%4d\t%12s" % (x, y['indices'][x]['primaries']['docs']['count'], y['indices'][x]['primaries']['segments']['count'], y['indices'][x]['primaries']['store']['size'])
     template_machin = lambda self, x, y: "%s\t%12d\t%4d\t%12s" % (x, y['indices'][x]['primaries']['docs']['count'], y['indices'][x]['primaries']['segments']['count'], y['indices'][x]['primaries']['store']['size_in_bytes'])
@@ -60,6 +72,12 @@ class IndiciesList(List):
     async def action(self, element, running):
         return await self.api.escnx.indices.stats(index=element[0], human=running.human)
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.indices.stats(index=self.joined_names(elements), human=running.human)
+
+    def split_result(self, element, response, running):
+        return {'indices': {element[0]: response['indices'][element[0]]}}
+
 
 @command(IndicesDispatcher, verb='recovery')
 class IndiciesRecovery(List):
@@ -144,14 +162,51 @@ class IndiciesForceMerge(Verb):
 
 @command(IndicesDispatcher, verb='delete')
 class IndiciesDelete(RepeterVerb):
+    # Only the pending tasks are read, for --max_pending
+    reads_before_writes = True
 
-    async def action(self, element, *args, **kwargs):
+    def fill_parser(self, parser):
+        super().fill_parser(parser)
+        parser.add_option("-c", "--chunked", dest="chunked", help="Delete the indices by chunks, one chunk at a time", default=False, action='store_true')
+        parser.add_option("--pause", dest="pause", help="Seconds to wait between chunks", default=0.0, type=float)
+        parser.add_option("--max_pending", dest="max_pending", help="Wait for the master to have at most that many pending tasks before each chunk", default=None, type=int)
+
+    async def action(self, element, running, *args, **kwargs):
+        if self.batched:
+            # An index of a refused chunk, it's deleted alone at the pace of the chunks
+            return await self._paced_delete(element[0], running)
         return await self.api.escnx.indices.delete(index=element[0])
 
-    def check_verb_args(self, running):
+    def in_flight_limit(self):
+        # Each chunk is a single cluster state update, they are sent one after the other, whatever --inflight says
+        return 1 if self.batched else super().in_flight_limit()
+
+    def check_verb_args(self, running, *args, chunked=False, pause=0.0, max_pending=None, **kwargs):
         if running.index_name == '*' or running.index_name == '_all':
             raise Exception("won't destroy everything, -n/--name mandatory")
-        return super().check_verb_args(running)
+        self.batched = chunked
+        running.pause = pause
+        running.max_pending = max_pending
+        running.last_chunk = None
+        return super().check_verb_args(running, *args, **kwargs)
+
+    async def _paced_delete(self, index, running, **kwargs):
+        if running.last_chunk is not None:
+            await sleep(max(0.0, running.last_chunk + running.pause - time.monotonic()))
+        if running.max_pending is not None:
+            await wait_pending_tasks(self.api.escnx.transport, running.max_pending)
+        try:
+            return await self.api.escnx.indices.delete(index=index, **kwargs)
+        finally:
+            running.last_chunk = time.monotonic()
+
+    async def batch_action(self, elements, running):
+        # A missing index fails the whole chunk, its indices are then deleted one by one, so each one is reported
+        return await self._paced_delete(self.joined_names(elements), running)
+
+    def split_result(self, element, response, running):
+        # An error for any index fails the whole chunk, so a response is for all of them
+        return response
 
     def format(self, running, name, result):
         return "%s deleted" % name
@@ -320,38 +375,115 @@ class IndiciesReindex(RepeterVerb):
                     })
         return reindex_status
 
+    def result_is_valid(self, result):
+        return isinstance(result, dict) and len(result.get('failures', [])) == 0
+
+    def format(self, running, name, result):
+        return "%s -> %s" % (name, json.dumps(result))
+
 
 @command(IndicesDispatcher, verb='dump')
 class IndiciesDump(DumpVerb):
 
-    async def get(self, running, index_name, **kwargs):
-        return await self.api.escnx.indices.get(index=index_name)
+    async def get(self, running, index_name, filter_path=None, **kwargs):
+        # Without attributes, the whole indices are dumped
+        filter_path = self.attrs_filter_path(running, filter_path) if len(running.attrs) > 0 else None
+        return await self.api.escnx.indices.get(index=index_name, filter_path=filter_path)
+
+
+class IndexDefaults(Mapping):
+    """
+    The default settings of an index, a view of the defaults shared by all the indices, without the index's own settings
+    """
+
+    def __init__(self, defaults, settings):
+        self.defaults = defaults
+        self.settings = settings
+
+    def __getitem__(self, key):
+        if key in self.settings:
+            raise KeyError(key)
+        return self.defaults[key]
+
+    def __iter__(self):
+        return (k for k in self.defaults if k not in self.settings)
+
+    def __len__(self):
+        return sum(1 for _ in self)
 
 
 @command(IndicesDispatcher, verb='readsettings')
 class IndiciesReadSettings(ReadSettings):
+    batched = True
+
+    def check_verb_args(self, running, *args, **kwargs):
+        # The defaults are shared by all the indices, only fetched again when an index can miss some of them
+        running.defaults = {}
+        running.defaults_missing = None
+        running.defaults_lock = Lock()
+        return super().check_verb_args(running, *args, **kwargs)
 
     async def get_elements(self, running):
         val = await self.api.escnx.cat.indices(index=running.index_name, format='json', h='index', expand_wildcards='all')
         return map(lambda x: x['index'], val)
 
+    def element_name(self, element):
+        return element
+
+    def upstream_element(self, name, value):
+        return name
+
+    def strip_index(self, settings):
+        # remove 'index.' at the beginning of settings names
+        return {k.replace('index.', ''): v for k, v in settings.items()}
+
     async def get_settings(self, running, element):
         # Can't use get_settings filtering of settings, because if settings name are given, or even '_all', flat_settings don't work any more
-        index_entry = await self.api.escnx.indices.get_settings(index=element, include_defaults=True, flat_settings=running.flat, expand_wildcards='all')
+        index_entry = await self.api.escnx.indices.get_settings(index=element, include_defaults=True, flat_settings=True, expand_wildcards='all')
         _, index_data = next(iter(index_entry.items()))
-        new_settings = {}
-        if running.flat:
-            # remove 'index.' at the beginning of settings names
-            new_settings['defaults'] = {k.replace('index.', ''): v for k, v in index_data['defaults'].items()}
-            new_settings['settings'] = {k.replace('index.', ''): v for k, v in index_data['settings'].items()}
-        else:
-            new_settings['defaults'] = index_data['defaults']['index']
-            new_settings['settings'] = index_data['settings']['index']
-        return new_settings
+        return {'defaults': self.strip_index(index_data['defaults']), 'settings': self.strip_index(index_data['settings'])}
+
+    async def batch_action(self, elements, running):
+        response = await self.api.escnx.indices.get_settings(index=self.joined_names(elements), flat_settings=True, expand_wildcards='all')
+        for index_name, index_data in response.items():
+            index_data['settings'] = self.strip_index(index_data['settings'])
+            await self.update_defaults(running, index_name, index_data['settings'])
+        return response
+
+    async def update_defaults(self, running, index_name, settings):
+        """
+        The defaults returned for an index don't include the settings it defines. So if it doesn't define some
+        settings missing from the shared defaults, its defaults are needed to fill them.
+        """
+        async with running.defaults_lock:
+            if running.defaults_missing is not None and running.defaults_missing.issubset(settings.keys()):
+                return
+            index_entry = await self.api.escnx.indices.get_settings(index=index_name, include_defaults=True, flat_settings=True, expand_wildcards='all')
+            running.defaults.update(self.strip_index(index_entry[index_name]['defaults']))
+            if running.defaults_missing is None:
+                running.defaults_missing = set(settings.keys())
+            else:
+                running.defaults_missing &= settings.keys()
+
+    def split_result(self, element, response, running):
+        settings = response[element]['settings']
+        return self.filter_settings(running, {'defaults': IndexDefaults(running.defaults, settings), 'settings': settings})
+
+    def to_str(self, running, item):
+        source, settings = item
+        if not running.flat and isinstance(settings, dict):
+            settings = {k: self.unflatten(v) for k, v in settings.items()}
+        return super().to_str(running, (source, settings))
 
 
 @command(IndicesDispatcher, verb='writesettings')
-class IndiciesWriteSettings(WriteSettings):
+class IndiciesWriteSettings(BatchedUpdate, WriteSettings):
+
+    def check_verb_args(self, running, *args, **kwargs):
+        verbargs = super().check_verb_args(running, *args, **kwargs)
+        # Flat settings are returned as strings
+        running.flat_values = {self.strip_index(k): v for k, v in normalize(self.flatten(running.values)).items()}
+        return verbargs
 
     async def get_elements(self, running):
         index_names = []
@@ -359,17 +491,73 @@ class IndiciesWriteSettings(WriteSettings):
             index_names.append((i, None))
         return index_names
 
-    async def action(self, element, running):
-        return await self.api.escnx.indices.put_settings(body=running.values, index=element[0])
+    def strip_index(self, name):
+        return name[6:] if name.startswith('index.') else name
+
+    async def read_current(self, elements, running):
+        response = await self.api.escnx.indices.get_settings(index=self.joined_names(elements), flat_settings=True, expand_wildcards='all')
+        return {k: v['settings'] for k, v in response.items()}
+
+    def is_unchanged(self, running, settings):
+        current = {self.strip_index(k): v for k, v in settings.items()}
+        return all(current.get(k) == v for k, v in running.flat_values.items())
+
+    async def update(self, elements, running):
+        return await self.api.escnx.indices.put_settings(body=running.values, index=self.joined_names(elements))
 
     def format(self, running, name, result):
-        return "%s set" % (name)
+        if result.get('unchanged', False):
+            return "%s unchanged" % (name)
+        else:
+            return "%s set" % (name)
+
+
+def mapping_subtree(current, wanted):
+    """
+    The part of the current mapping at the places defined by the wanted one
+    """
+    if not isinstance(wanted, dict) or not isinstance(current, dict):
+        return current
+    return {k: mapping_subtree(current.get(k), v) for k, v in wanted.items()}
+
+
+class MappingUpdate(BatchedUpdate):
+    """
+    The indices whose mapping already contains the wanted one are skipped
+    """
+
+    def wanted_mapping(self, running):
+        raise NotImplementedError
+
+    def mapping_type(self, running):
+        raise NotImplementedError
+
+    def check_verb_args(self, running, *args, **kwargs):
+        verbargs = super().check_verb_args(running, *args, **kwargs)
+        running.wanted_hash = structural_hash(self.wanted_mapping(running))
+        return verbargs
+
+    async def read_current(self, elements, running):
+        response = await self.api.escnx.indices.get_mapping(index=self.joined_names(elements), expand_wildcards='all')
+        current = {}
+        doc_type = self.mapping_type(running)
+        for index_name, index_data in response.items():
+            mappings = index_data.get('mappings', {})
+            if doc_type is not None and doc_type in mappings:
+                mappings = mappings[doc_type]
+            current[index_name] = mappings
+        return current
+
+    def is_unchanged(self, running, mappings):
+        wanted = self.wanted_mapping(running)
+        return structural_hash(mapping_subtree(mappings, wanted)) == running.wanted_hash
 
 
 @command(IndicesDispatcher, verb='addmapping')
-class IndiciesAddMapping(RepeterVerb):
+class IndiciesAddMapping(MappingUpdate):
 
     def fill_parser(self, parser):
+        super().fill_parser(parser)
         parser.add_option("-f", "--mapping_file", dest="mapping_file_name", help="The file with the added mapping", default=None)
         parser.add_option("-t", "--type", dest="type", help="The type to add the mapping to", default='_default_')
 
@@ -387,8 +575,14 @@ class IndiciesAddMapping(RepeterVerb):
         running.type = type
         return super().check_verb_args(running, *args, **kwargs)
 
-    async def action(self, element, running):
-        return await self.api.escnx.indices.put_mapping(index=element[0], body={"properties": running.properties}, doc_type=running.type)
+    def wanted_mapping(self, running):
+        return {"properties": running.properties}
+
+    def mapping_type(self, running):
+        return running.type
+
+    async def update(self, elements, running):
+        return await self.api.escnx.indices.put_mapping(index=self.joined_names(elements), body={"properties": running.properties}, doc_type=running.type)
 
     def to_str(self, running, value):
         return "%s -> %s" % (list(running.object.keys())[0], value.__str__())
@@ -396,18 +590,27 @@ class IndiciesAddMapping(RepeterVerb):
 
 @command(IndicesDispatcher, verb='getfields')
 class IndicesGetFieldMapping(RepeterVerb):
+    """
+    The indices are grouped by mapping, each distinct mapping is given once with the list of indices that use it.
+    The flattened fields of a mapping are cached on disk, by the structural hash of the mapping.
+    """
+    batched = True
 
     def fill_parser(self, parser):
         parser.add_option("-t", "--type", dest="type", help="The type to add the mapping to", default='_doc')
         parser.add_option("-f", "--flat", dest="flat", default=False, action='store_true')
         parser.add_option("-p", "--pretty", dest="pretty", default=False, action='store_true')
+        parser.add_option("-i", "--per_index", dest="per_index", help="The mapping of each index, not grouped", default=False, action='store_true')
+        parser.add_option("--cache_dir", dest="cache_dir", help="Where to cache the flattened fields", default=os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'eslib', 'fields'))
 
-    def check_verb_args(self, running, *args, flat=False, type='_doc', **kwargs):
+    def check_verb_args(self, running, *args, flat=False, type='_doc', per_index=False, cache_dir=None, **kwargs):
         running.type = type
         running.flat = flat
+        running.per_index = per_index
+        running.cache_dir = cache_dir
         return super().check_verb_args(running, *args, **kwargs)
 
-    async def get(self, running):
+    async def get(self, running, **kwargs):
         return await self.api.escnx.cat.indices(index=running.index_name, format='json', h='index')
 
     async def get_elements(self, running):
@@ -416,7 +619,7 @@ class IndicesGetFieldMapping(RepeterVerb):
             index_names.append((i['index'], None))
         return index_names
 
-    async def action(self, element, running):
+    def get_mapping_args(self, running):
         kwargs={}
         if self.api.type_handling == TypeHandling.DEPRECATED:
             kwargs['doc_type'] = None
@@ -424,22 +627,91 @@ class IndicesGetFieldMapping(RepeterVerb):
             kwargs['doc_type'] = running.type
         elif self.api.type_handling == TypeHandling.TRANSITION:
             kwargs['doc_type'] = None
+        return kwargs
 
+    async def action(self, element, running):
         try:
-            val = await self.api.escnx.indices.get_mapping(index=element[0], **kwargs)
+            val = await self.api.escnx.indices.get_mapping(index=element[0], **self.get_mapping_args(running))
             return val
         except NotFoundError as e:
             return e
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.indices.get_mapping(index=self.joined_names(elements), **self.get_mapping_args(running))
+
+    def split_result(self, element, response, running):
+        return {element[0]: response[element[0]]}
+
+    async def execute(self, running, *args, **kwargs):
+        results = await super().execute(running, *args, **kwargs)
+        if running.per_index:
+            return results
+        else:
+            return self.grouped(running, results)
+
+    async def grouped(self, running, results):
+        # The mapping of each group is kept once, with the names of the indices
+        groups = {}
+        async for item in results:
+            if isinstance(item, Exception) or not self.result_is_valid(item[1]):
+                yield item
+                continue
+            index = item[0][0]
+            mappings_data = self.properties(running, index, item[1])
+            mapping_hash = structural_hash(mappings_data)
+            if mapping_hash not in groups:
+                groups[mapping_hash] = ([], mappings_data)
+            groups[mapping_hash][0].append(index)
+        for mapping_hash, (indices, mappings_data) in groups.items():
+            yield ((mapping_hash, indices), mappings_data)
+
     def result_is_valid(self, result):
         return not isinstance(result, ElasticsearchException)
 
-    def format(self, running, index, result):
+    def properties(self, running, index, result):
         mappings = result[index]
         if self.api.type_handling == TypeHandling.DEPRECATED:
-            mappings_data = mappings['mappings']['properties']
+            return mappings['mappings']['properties']
+        else:
+            return mappings['mappings'][running.type]['properties']
+
+    def to_str(self, running, value):
+        if running.per_index or not isinstance(value[0][1], list):
+            return super().to_str(running, value)
+        (mapping_hash, indices), mappings_data = value
+        if running.flat:
+            return self.format_group(running, mapping_hash, indices, mappings_data)
         else:
-            mappings_data = mappings['mappings'][running.type]['properties']
+            return dumps({'hash': mapping_hash, 'indices': indices, 'properties': mappings_data})
+
+    def format_group(self, running, mapping_hash, indices, mappings_data):
+        yield '%s: %s' % (mapping_hash, ','.join(indices))
+        for field in self.cached_fields(running, mapping_hash, mappings_data):
+            yield '    ' + field
+
+    def cached_fields(self, running, mapping_hash, mappings_data):
+        cache_file_name = None if running.cache_dir is None else os.path.join(running.cache_dir, mapping_hash + '.json')
+        if cache_file_name is not None:
+            try:
+                with open(cache_file_name, 'r', encoding='utf-8') as cache_file:
+                    return json.load(cache_file)
+            except (OSError, ValueError):
+                pass
+        fields = list(self.flatten('', mappings_data))
+        if cache_file_name is not None:
+            try:
+                os.makedirs(running.cache_dir, exist_ok=True)
+                # Written then renamed, so a concurrent run never reads a partial file, each run has its own
+                tmp_name = '%s.%d.tmp' % (cache_file_name, os.getpid())
+                with open(tmp_name, 'w', encoding='utf-8') as cache_file:
+                    json.dump(fields, cache_file)
+                os.replace(tmp_name, cache_file_name)
+            except OSError:
+                pass
+        return fields
+
+    def format(self, running, index, result):
+        mappings_data = self.properties(running, index, result)
         if running.flat:
             yield from self.flatten(index, mappings_data)
         else:
@@ -454,6 +726,98 @@ class IndicesGetFieldMapping(RepeterVerb):
                 yield prefix + separator + str(k) + ": " + v['type']
 
 
+@command(IndicesDispatcher, verb='diff')
+class IndicesDiff(RepeterVerb):
+    """
+    The indices are grouped by identical settings and mappings, and each group is compared to the biggest one, or
+    to a template. Only the differing paths are given.
+    """
+    batched = True
+
+    # Settings that are different for each index
+    volatile_settings = ('index.uuid', 'index.creation_date', 'index.provided_name', 'index.version.',
+                         'index.resize.source.', 'index.routing.allocation.initial_recovery.')
+
+    def fill_parser(self, parser):
+        super().fill_parser(parser)
+        parser.add_option("-t", "--template", dest="template", help="Compare the indices with this template", default=None)
+        parser.add_option("-s", "--settings", dest="settings", help="Only compare the settings", default=False, action='store_true')
+        parser.add_option("-m", "--mappings", dest="mappings", help="Only compare the mappings", default=False, action='store_true')
+
+    def check_verb_args(self, running, *args, template=None, settings=False, mappings=False, **kwargs):
+        running.template = template
+        running.parts = [part for (part, selected) in (('settings', settings), ('mappings', mappings)) if selected or not (settings or mappings)]
+        return super().check_verb_args(running, *args, **kwargs)
+
+    def canonical(self, running, data):
+        """
+        The flat paths of the compared parts, with scalars written as strings
+        """
+        flat = {}
+        for part in running.parts:
+            for k, v in self.flatten(data.get(part) or {}).items():
+                if part == 'settings':
+                    if not k.startswith('index.'):
+                        k = 'index.' + k
+                    if k.startswith(self.volatile_settings):
+                        continue
+                flat['%s.%s' % (part, k)] = v
+        return normalize(flat)
+
+    async def batch_action(self, elements, running):
+        filter_path = ','.join('*.%s' % part for part in running.parts)
+        return await self.api.escnx.indices.get(index=self.joined_names(elements), flat_settings=True, expand_wildcards='all', filter_path=filter_path)
+
+    async def action(self, element, running):
+        return self.split_result(element, await self.batch_action([element], running), running)
+
+    def split_result(self, element, response, running):
+        return self.canonical(running, response[element[0]])
+
+    def result_is_valid(self, result):
+        return not isinstance(result, ElasticsearchException)
+
+    async def execute(self, running, *args, **kwargs):
+        results = await super().execute(running, *args, **kwargs)
+        reference = None
+        if running.template is not None:
+            templates = await self.api.escnx.indices.get_template(name=running.template, flat_settings=True)
+            reference = self.canonical(running, templates[running.template])
+        return self.clusters(running, results, reference)
+
+    async def clusters(self, running, results, reference):
+        # Each distinct document is kept once, with the names of the indices
+        clusters = {}
+        async for item in results:
+            if isinstance(item, Exception):
+                yield item
+                continue
+            flat = item[1]
+            digest = structural_hash(flat)
+            if digest not in clusters:
+                clusters[digest] = ([], flat)
+            clusters[digest][0].append(item[0][0])
+        ordered = sorted(clusters.items(), key=lambda x: (-len(x[1][0]), x[1][0][0]))
+        template_settings = None
+        if reference is None and len(ordered) > 0:
+            reference = ordered[0][1][1]
+        elif reference is not None:
+            # Only the settings defined by the template are compared
+            template_settings = {k for k in reference if k.startswith('settings.')}
+        for (digest, (indices, flat)) in ordered:
+            paths = set(flat.keys()) | set(reference.keys())
+            if template_settings is not None:
+                paths = {k for k in paths if not k.startswith('settings.') or k in template_settings}
+            differences = [(k, reference.get(k), flat.get(k)) for k in sorted(paths) if reference.get(k) != flat.get(k)]
+            yield ((digest, indices), differences)
+
+    def to_str(self, running, value):
+        (digest, indices), differences = value
+        yield '%s: %d indices %s' % (digest[0:12], len(indices), ','.join(indices))
+        for (path, expected, found) in differences:
+            yield '    %s: %s -> %s' % (path, '-' if expected is None else expected, '-' if found is None else found)
+
+
 @command(IndicesDispatcher)
 class IndiciesCat(CatVerb):
 
@@ -507,6 +871,7 @@ class IndicesCreate(Verb):
 
 @command(IndicesDispatcher, verb='stats')
 class IndicesStats(DumpVerb):
+    batched = True
 
     def fill_parser(self, parser):
         super().fill_parser(parser)
@@ -524,6 +889,14 @@ class IndicesStats(DumpVerb):
     async def action(self, element, running, *args, only_keys=False, **kwargs):
         return await self.api.escnx.indices.stats(element[0], metric=running.metrics)
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.indices.stats(self.joined_names(elements), metric=running.metrics)
+
+    def split_result(self, element, response, running):
+        # The per shards counts of a single index are not available in a batched response
+        stats = response['indices'][element[0]]
+        return {'_all': {k: v for k, v in stats.items() if k in ('primaries', 'total')}, 'indices': {element[0]: stats}}
+
     def to_str(self, running, value):
         if running.flat:
             stats = {k: self.flatten(v) for k, v in value[1]['indices'].items()}
@@ -544,6 +917,7 @@ class IndicesStats(DumpVerb):
 
 @command(IndicesDispatcher, verb='explain_lifecycle')
 class IndicesExplainLifecycl(DumpVerb):
+    batched = True
 
     def fill_parser(self, parser):
         super().fill_parser(parser)
@@ -558,26 +932,85 @@ class IndicesExplainLifecycl(DumpVerb):
     async def action(self, element, running, *args, only_keys=False, **kwargs):
         return await self.api.escnx.ilm.explain_lifecycle(element[0], only_errors=running.only_errors, only_managed=running.only_managed)
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.ilm.explain_lifecycle(self.joined_names(elements), only_errors=running.only_errors, only_managed=running.only_managed)
+
+    def split_result(self, element, response, running):
+        # Indices filtered out by only_errors or only_managed are missing
+        indices = response['indices']
+        return {'indices': {element[0]: indices[element[0]]} if element[0] in indices else {}}
+
     def to_str(self, running, value):
         return dumps(value[1])
 
 
 @command(IndicesDispatcher, verb='retry_policy')
 class IndicesRetryPolicy(RepeterVerb):
+    batched = True
+
+    def fill_parser(self, parser):
+        super().fill_parser(parser)
+        parser.add_option("-f", "--from_file", dest="from_file", help="Retry the indices listed in that file, like the errors file of ilm report", default=None)
+
+    def check_verb_args(self, running, *args, from_file=None, **kwargs):
+        running.from_file = from_file
+        return super().check_verb_args(running, *args, **kwargs)
+
+    async def get(self, running, **kwargs):
+        if running.from_file is not None:
+            # The indices are already known
+            return {}
+        return await super().get(running, **kwargs)
+
+    async def get_elements(self, running):
+        if running.from_file is None:
+            return await super().get_elements(running)
+        with open(running.from_file, 'r') as from_file:
+            return [(line.strip(), None) for line in from_file if line.strip() != '']
 
     async def action(self, element, running, *args, only_keys=False, **kwargs):
         return await self.api.escnx.ilm.retry(element[0])
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.ilm.retry(self.joined_names(elements))
+
+    def split_result(self, element, response, running):
+        # If any index can't be retried, the whole chunk is refused
+        return response
+
     def to_str(self, running, value):
         return dumps(value[1])
 
 
 @command(IndicesDispatcher, verb='segments')
 class IndicesSegments(RepeterVerb):
+    batched = True
 
     async def action(self, element, running, *args, only_keys=False, **kwargs):
         return await self.api.escnx.indices.segments(element[0])
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.indices.segments(self.joined_names(elements))
+
+    def split_result(self, element, response, running):
+        return {'indices': {element[0]: response['indices'][element[0]]}}
+
+    def result_is_valid(self, result):
+        return not isinstance(result, ElasticsearchException)
+
+    def where_values(self, running, element, result):
+        # The segments of the primary shards
+        values = {'count': 0, 'num_docs': 0, 'deleted_docs': 0, 'size_in_bytes': 0}
+        for replicas in result['indices'][element[0]]['shards'].values():
+            for shard in replicas:
+                if not shard['routing']['primary']:
+                    continue
+                for si in shard['segments'].values():
+                    values['count'] += 1
+                    for k in ('num_docs', 'deleted_docs', 'size_in_bytes'):
+                        values[k] += si[k]
+        return values
+
     def to_str(self, running, value):
         segments_data = value[1]['indices'][value[0][0]]
         datas = {}
@@ -593,7 +1026,7 @@ class IndicesSegments(RepeterVerb):
 
 
 @command(IndicesDispatcher, verb='updatemapping')
-class IndicesUpdateMapping(RepeterVerb):
+class IndicesUpdateMapping(MappingUpdate):
 
     def fill_parser(self, parser):
         super().fill_parser(parser)
@@ -629,13 +1062,21 @@ class IndicesUpdateMapping(RepeterVerb):
                 running.mapping = load(template_file, Loader=Loader)
         return super().check_verb_args(running, *args, **kwargs)
 
-    async def action(self, element, running):
-        return await self.api.escnx.indices.put_mapping(running.mappings, index=element[0], doc_type=running.doc_type)
+    def wanted_mapping(self, running):
+        return running.mappings
+
+    def mapping_type(self, running):
+        return running.doc_type
+
+    async def update(self, elements, running):
+        return await self.api.escnx.indices.put_mapping(running.mappings, index=self.joined_names(elements), doc_type=running.doc_type)
 
     def to_str(self, running, value):
         name = value[0][0]
         status = value[1].get('acknowledged', False)
-        if status and name is not None:
+        if status and name is not None and value[1].get('unchanged', False):
+            return '%s mapping unchanged' % name
+        elif status and name is not None:
             return '%s mapping updated' % name
         elif status and name is not None:
             return {name: value}
@@ -684,6 +1125,8 @@ class ClusterAllocationExplain(DumpVerb):
 
 @command(IndicesDispatcher, verb='ilm')
 class IndicesIlmExplain(RepeterVerb):
+    batched = True
+
     def fill_parser(self, parser):
         parser.add_option("--only_errors", dest="errors", default=False, action='store_true')
         parser.add_option("--only_managed", dest="managed", default=False, action='store_true')
@@ -700,6 +1143,16 @@ class IndicesIlmExplain(RepeterVerb):
     async def action(self, element, running, *args, only_keys=False, **kwargs):
         return await self.api.escnx.ilm.explain_lifecycle(index=element[0], only_managed=running.managed, only_errors=running.errors)
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.ilm.explain_lifecycle(index=self.joined_names(elements), only_managed=running.managed, only_errors=running.errors)
+
+    def split_result(self, element, response, running):
+        indices = response['indices']
+        return {'indices': {element[0]: indices[element[0]]} if element[0] in indices else {}}
+
+    def result_is_valid(self, result):
+        return not isinstance(result, ElasticsearchException)
+
     def to_str(self, running, value):
         for (index, ilm) in value[1]['indices'].items():
             if 'phase' in ilm and ilm['phase'] == running.phase:
@@ -0,0 +1,68 @@
+import json
+import os
+import time
+
+
+class Journal(object):
+    """
+    An append only file, with one json line for each element done by a RepeterVerb. When a run is started again
+    with the same journal, the elements that succeeded are skipped, the failed ones are tried again.
+    Each line is written with a single write on a file opened in append mode, so it can be safely tailed, and an
+    interruption can only lose the last line.
+    """
+
+    # The errors are cut to that length
+    max_error_length = 200
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.done = set()
+        self.fd = None
+        try:
+            with open(file_name, 'r', encoding='utf-8') as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                        key = self._key(entry['noun'], entry['verb'], entry['args'], entry['element'])
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut by an interruption, or not written by a journal
+                        continue
+                    status = entry.get('status')
+                    if status == 'ok':
+                        self.done.add(key)
+                    elif status is not None:
+                        self.done.discard(key)
+        except FileNotFoundError:
+            pass
+
+    def _key(self, noun, verb, args, element):
+        return (noun, verb, tuple(args), element)
+
+    def is_done(self, noun, verb, args, element):
+        return self._key(noun, verb, args, element) in self.done
+
+    def record(self, noun, verb, args, element, error=None):
+        """
+        Only the status is kept, with a short error for a failed element, so a line stays small whatever the result
+        """
+        if self.fd is None:
+            self.fd = os.open(self.file_name, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            # Terminate a line cut by an interruption
+            size = os.lseek(self.fd, 0, os.SEEK_END)
+            if size > 0 and os.pread(self.fd, 1, size - 1) != b'\n':
+                os.write(self.fd, b'\n')
+        entry = {'time': round(time.time(), 3), 'noun': noun, 'verb': verb, 'args': list(args), 'element': element}
+        if error is not None:
+            entry['status'] = 'failed'
+            entry['error'] = error[0:self.max_error_length]
+            self.done.discard(self._key(noun, verb, args, element))
+        else:
+            entry['status'] = 'ok'
+            self.done.add(self._key(noun, verb, args, element))
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        os.write(self.fd, line.encode('utf-8'))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -14,7 +14,7 @@ for i in ('name', 'transport_address', 'ip', 'host', 'version', 'roles'):
 default_filter_path = ','.join(filter)
 
 
-@dispatcher(object_name="node", default_filter_path='nodes.*.name')
+@dispatcher(object_name="node", default_filter_path='nodes.*.name', element_filter_path='nodes.*')
 class NodesDispatcher(Dispatcher):
 
     def fill_parser(self, parser):
@@ -31,12 +31,21 @@ class NodesDispatcher(Dispatcher):
 
 @command(NodesDispatcher)
 class NodesList(List):
+    # One request with the node filter, nodes missing from the response, because they timed out, are then requested alone
+    batched = True
+    max_url_length = None
+    info_filter_path = ['nodes.*.name', 'nodes.*.version', 'nodes.*.transport_address', 'nodes.*.roles']
 
     async def action(self, element, running, filter_path=None, **kwargs):
-        infos = await self.api.escnx.nodes.info(element[0], human=True, filter_path=['nodes.*.name', 'nodes.*.version',
-                                                                                          'nodes.*.transport_address', 'nodes.*.roles'])
+        infos = await self.api.escnx.nodes.info(element[0], human=True, filter_path=self.info_filter_path)
         return infos
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.nodes.info(running.node_name, human=True, filter_path=self.info_filter_path)
+
+    def split_result(self, element, response, running):
+        return {'nodes': {element[0]: response['nodes'][element[0]]}}
+
     def to_str(self, running, item):
         value = list(item[1]['nodes'].items())[0][1]
         name = value.pop('name')
@@ -109,6 +118,8 @@ class NodesRebalance(Verb):
 
 @command(NodesDispatcher, verb='stats')
 class NodesStats(DumpVerb):
+    batched = True
+    max_url_length = None
 
     def fill_parser(self, parser):
         super().fill_parser(parser)
@@ -122,6 +133,12 @@ class NodesStats(DumpVerb):
         val = await self.api.escnx.nodes.stats(element[0], metric=running.metrics, level='node')
         return val
 
+    async def batch_action(self, elements, running):
+        return await self.api.escnx.nodes.stats(running.node_name, metric=running.metrics, level='node', filter_path='nodes')
+
+    def split_result(self, element, response, running):
+        return {'nodes': {element[0]: response['nodes'][element[0]]}}
+
     def to_str(self, running, value):
         for k, v in value[1]['nodes'].items():
             yield "{\"%s\": %s}" % (v['name'], json.dumps(v, **running.formatting))
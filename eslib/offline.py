@@ -0,0 +1,258 @@
+import fnmatch
+import gzip
+import json
+import os
+import sys
+import time
+from asyncio import Event, gather
+from elasticsearch.connection import Connection
+from elasticsearch.exceptions import NotFoundError, TransportError
+from eslib.exceptions import ESLibError
+from eslib.plan import endpoint
+
+# The requests sent by snapshot-state, for the whole cluster
+snapshot_requests = [
+    ('/', {}),
+    ('/_cluster/health', {'level': 'cluster'}),
+    ('/_cluster/state', {}),
+    ('/_cluster/settings', {}),
+    ('/_nodes', {'human': 'true'}),
+    ('/_nodes/stats', {'level': 'node'}),
+    ('/_all', {}),
+    ('/_all/_stats', {'human': 'true'}),
+    ('/_all/_shard_stores', {'status': 'all'}),
+    ('/_all/_ilm/explain', {}),
+    ('/_template', {}),
+    ('/_ilm/policy', {}),
+    ('/_tasks', {'detailed': 'true', 'group_by': 'nodes'}),
+]
+
+# The parameters that change the structure of a response, a request can only be served by a captured one with the
+# same values, the others are ignored
+shape_params = frozenset(['level', 'group_by', 'actions', 'flat_settings', 'include_defaults'])
+
+# The responses that can be built from a part of an other one
+derived = {
+    '/_all/_settings': ('/_all', 'settings'),
+    '/_all/_mapping': ('/_all', 'mappings'),
+    '/_all/_alias': ('/_all', 'aliases'),
+}
+
+
+def _match_key(pattern, key):
+    return pattern == '*' or pattern == key or ('*' in pattern and fnmatch.fnmatchcase(key, pattern))
+
+
+def _filter(data, paths):
+    if any(len(p) == 0 for p in paths):
+        return data
+    if isinstance(data, list):
+        filtered = [v for v in (_filter(v, paths) for v in data) if v is not None and v != {}]
+        return filtered if len(filtered) > 0 else None
+    if not isinstance(data, dict):
+        return None
+    filtered = {}
+    for key, value in data.items():
+        sub_paths = []
+        for path in paths:
+            if path[0] == '**':
+                sub_paths.append(path)
+                sub_paths.append(path[1:])
+            elif _match_key(path[0], key):
+                sub_paths.append(path[1:])
+        if len(sub_paths) > 0:
+            sub_value = _filter(value, sub_paths)
+            if sub_value is not None and sub_value != {}:
+                filtered[key] = sub_value
+    return filtered
+
+
+def filter_path(data, filter_path):
+    """
+    Apply a filter_path parameter to a response, like Elasticsearch does
+    """
+    if filter_path is None or filter_path == '':
+        return data
+    paths = [p.split('.') for p in filter_path.split(',') if p != '']
+    filtered = _filter(data, paths)
+    return {} if filtered is None else filtered
+
+
+def _shape(params):
+    shape = {}
+    for (k, v) in params.items():
+        if isinstance(v, bytes):
+            v = v.decode('utf-8')
+        if k in shape_params and v != '':
+            shape[k] = str(v)
+    return shape
+
+
+def _matches(names, key, value):
+    matched = False
+    for name in names:
+        excluded = name.startswith('-')
+        if excluded:
+            name = name[1:]
+        if name == '_all' or _match_key(name, key) or (isinstance(value, dict) and value.get('name') == name):
+            matched = not excluded
+    return matched
+
+
+def select(response, names):
+    """
+    The part of a response about some indices or nodes, returns the selection and the concrete names not found
+    """
+    if isinstance(response.get('nodes'), dict):
+        container = 'nodes'
+    elif isinstance(response.get('indices'), dict):
+        container = 'indices'
+    else:
+        container = None
+    elements = response if container is None else response[container]
+    selected = {k: v for (k, v) in elements.items() if _matches(names, k, v)}
+    missing = [n for n in names if '*' not in n and not n.startswith('-') and n != '_all'
+               and n not in selected and not any(isinstance(v, dict) and v.get('name') == n for v in selected.values())]
+    if container is None:
+        return selected, missing
+    else:
+        response = dict(response)
+        response[container] = selected
+        return response, missing
+
+
+class Bundle(object):
+    """
+    The responses captured by snapshot-state, indexed by method and path when loaded
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        try:
+            with gzip.open(file_name, 'rt', encoding='utf-8') as bundle_file:
+                content = json.load(bundle_file)
+        except (OSError, ValueError) as e:
+            raise ESLibError('unusable offline bundle %s: %s' % (file_name, e))
+        self.captured = content.get('captured')
+        self.url = content.get('url')
+        self.entries = {}
+        for (method, path, params, response) in content['responses']:
+            self.entries.setdefault((method, path), []).append((_shape(params), response))
+
+    def _find(self, method, path, shape):
+        for (captured_shape, response) in self.entries.get((method, path), []):
+            if captured_shape == shape:
+                return response
+        if path in derived and len(shape) == 0:
+            (base, part) = derived[path]
+            response = self._find(method, base, shape)
+            if response is not None:
+                return {k: {part: v.get(part, {})} for (k, v) in response.items()}
+        return None
+
+    def lookup(self, method, url, params):
+        """
+        The response to a request, a NotFoundError for missing elements, an ESLibError if it was not captured
+        """
+        path = '/' + url.split('?', 1)[0].strip('/')
+        get_method = 'GET' if method == 'HEAD' else method
+        shape = _shape(params)
+        response = self._find(get_method, path, shape)
+        if response is None and path != '/':
+            # The names are taken from the response for all of them
+            segments = path.strip('/').split('/')
+            pattern = endpoint(path)[0].strip('/').split('/')
+            if '{}' in pattern:
+                position = pattern.index('{}')
+                names = segments[position].split(',')
+                for generic in (segments[:position] + ['_all'] + segments[position + 1:],
+                                segments[:position] + segments[position + 1:]):
+                    response = self._find(get_method, '/' + '/'.join(generic), shape)
+                    if response is not None:
+                        break
+                if response is not None:
+                    (response, missing) = select(response, names)
+                    if len(missing) > 0:
+                        raise NotFoundError(404, 'index_not_found_exception',
+                                            {'error': {'type': 'index_not_found_exception', 'resource.id': missing[0]}})
+        if response is None:
+            raise ESLibError('not in the offline bundle %s: %s %s' % (self.file_name, method, path))
+        return filter_path(response, params.get('filter_path'))
+
+
+class LocalHandler(object):
+    """
+    Replaces the curl multi handle for the connections that don't use the network
+    """
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.stopped = Event()
+        self.requests = 0
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.history = None
+
+    @property
+    def running(self):
+        return not self.stopped.is_set()
+
+    @running.setter
+    def running(self, value):
+        if not value:
+            self.stopped.set()
+
+    def count(self, method, path, sent, received):
+        self.requests += 1
+        self.sent_bytes += sent
+        self.received_bytes += received
+        if self.history is not None:
+            self.history.record(method, path, received)
+
+    async def perform(self):
+        await self.stopped.wait()
+
+
+class OfflineConnection(Connection):
+    """
+    A connection that serves the requests from a bundle captured by snapshot-state
+    """
+
+    def __init__(self, bundle=None, multi_handle=None, **kwargs):
+        super().__init__(**kwargs)
+        self.bundle = bundle
+        self.multi_handle = multi_handle
+
+    async def perform_request(self, method, url, params=None, body=None, headers={}, ignore=(), future=None, timeout=None):
+        params = {} if params is None else params
+        if isinstance(params.get('filter_path'), bytes):
+            params = dict(params, filter_path=params['filter_path'].decode('utf-8'))
+        try:
+            response = self.bundle.lookup(method, url, params)
+            data = '' if method == 'HEAD' else json.dumps(response)
+            self.multi_handle.count(method, url, 0 if body is None else len(body), len(data))
+            future.set_result((200, {'content-type': 'application/json'}, data))
+        except (TransportError, ESLibError) as e:
+            future.set_exception(e)
+        return future
+
+
+async def snapshot(transport, file_name, url=None):
+    """
+    Capture the responses of snapshot_requests, all sent at once, in a gzip compressed bundle
+    """
+    async def capture(path, params):
+        try:
+            response = await transport.perform_request('GET', path, headers={}, params=dict(params))
+            return ['GET', path, params, response]
+        except TransportError as e:
+            print('%s not captured: %s' % (path, e), file=sys.stderr)
+            return None
+
+    responses = [r for r in await gather(*[capture(p, params) for (p, params) in snapshot_requests]) if r is not None]
+    content = {'captured': round(time.time(), 3), 'url': url, 'responses': responses}
+    tmp_name = '%s.%d.tmp' % (file_name, os.getpid())
+    with gzip.open(tmp_name, 'wt', encoding='utf-8') as bundle_file:
+        json.dump(content, bundle_file, separators=(',', ':'))
+    os.replace(tmp_name, file_name)
+    return len(responses)
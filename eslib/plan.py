@@ -0,0 +1,129 @@
+import json
+from contextvars import ContextVar
+from urllib.parse import unquote
+from eslib.exceptions import ESLibError
+
+# Set in the tasks running the actions of a RepeterVerb, so their requests are planned, not sent. 'all' for every
+# request, 'writes' when the GET and HEAD requests are still sent
+planning = ContextVar('planning', default=None)
+
+# The fixed words of the Elasticsearch API paths, any other segment is a list of names
+api_words = frozenset(['stats', 'settings', 'policy', 'explain', 'health', 'state', 'indices', 'shards', 'recovery',
+                       'segments', 'info', 'hot_threads', 'usage', 'move', 'retry', 'remove', 'status', 'allocation',
+                       'nodes', 'aliases', 'templates', 'tasks', 'master', 'count', 'thread_pool', 'field', 'fields',
+                       'cancel', 'reroute', 'start', 'stop'])
+
+
+def endpoint(url):
+    """
+    The pattern of an url, with the names replaced by {}, and how many names it uses
+    """
+    segments = []
+    names = 0
+    for s in url.split('?', 1)[0].strip('/').split('/'):
+        if s == '' or s.startswith('_') or s in api_words:
+            segments.append(s)
+        else:
+            segments.append('{}')
+            if names == 0:
+                names = len(unquote(s).split(','))
+    return '/' + '/'.join(segments), names
+
+
+class PlannedRequest(ESLibError):
+
+    def __init__(self, method, url):
+        super().__init__('planned request %s %s' % (method, url))
+        self.method = method
+        self.url = url
+
+
+class History(object):
+    """
+    The size of the responses already received for each endpoint, used to estimate the size of the planned ones
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.endpoints = {}
+        try:
+            with open(file_name, 'r', encoding='utf-8') as history_file:
+                self.endpoints = json.load(history_file)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def record(self, method, url, size):
+        (pattern, names) = endpoint(url)
+        entry = self.endpoints.setdefault('%s %s' % (method, pattern), [0, 0, 0])
+        entry[0] += 1
+        entry[1] += names
+        entry[2] += size
+
+    def estimate(self, method, pattern, requests, names):
+        entry = self.endpoints.get('%s %s' % (method, pattern))
+        if entry is None:
+            return None
+        elif names > 0 and entry[1] > 0:
+            return int(entry[2] / entry[1] * names)
+        else:
+            return int(entry[2] / entry[0] * requests)
+
+    def save(self):
+        with open(self.file_name, 'w', encoding='utf-8') as history_file:
+            json.dump(self.endpoints, history_file, indent=1, sort_keys=True)
+
+
+class Plan(object):
+    """
+    The requests a command would send, grouped by endpoint. Only GET and HEAD requests needed to find the elements, or
+    to know what an update would change, are sent, the others are recorded
+    """
+
+    def __init__(self, history=None):
+        self.history = history
+        self.sent = 0
+        self.in_flight = None
+        self.planned = {}
+
+    def record(self, method, url):
+        (pattern, names) = endpoint(url)
+        entry = self.planned.setdefault((method, pattern), [0, 0])
+        entry[0] += 1
+        entry[1] += names
+
+    def lines(self):
+        yield 'sent: %d requests to find the elements' % self.sent
+        total = 0
+        for ((method, pattern), (requests, names)) in sorted(self.planned.items()):
+            line = 'planned: %s %s %d requests' % (method, pattern, requests)
+            if names > 0:
+                line += ' for %d names' % names
+            size = None if self.history is None else self.history.estimate(method, pattern, requests, names)
+            if size is not None:
+                line += ', ~%d bytes' % size
+                total += size
+            yield line
+        if self.in_flight is not None:
+            yield 'in flight: %d' % self.in_flight
+        if total > 0:
+            yield 'estimated size: ~%d bytes' % total
+
+
+class PlanTransport(object):
+    """
+    Wraps the transport of the client, the requests that could change something or run an action are not sent
+    """
+
+    def __init__(self, transport, plan):
+        self.transport = transport
+        self.plan = plan
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    async def perform_request(self, method, url, headers=None, params=None, body=None):
+        if planning.get() == 'all' or method not in ('GET', 'HEAD'):
+            self.plan.record(method, url)
+            raise PlannedRequest(method, url)
+        self.plan.sent += 1
+        return await self.transport.perform_request(method, url, headers=headers, params=params, body=body)
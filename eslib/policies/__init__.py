@@ -1,4 +1,5 @@
-from eslib.verb import Verb, List, DumpVerb, RepeterVerb
+from eslib.verb import Verb, List, DumpVerb, RepeterVerb, SyncVerb
+from eslib import normalize
 from eslib.dispatcher import dispatcher, command, Dispatcher
 from yaml import load
 try:
@@ -7,7 +8,7 @@ except ImportError:
     from yaml import Loader
 
 
-@dispatcher(object_name="policy")
+@dispatcher(object_name="policy", element_filter_path='*')
 class PoliciesDispatcher(Dispatcher):
 
     def fill_parser(self, parser):
@@ -18,7 +19,7 @@ class PoliciesDispatcher(Dispatcher):
         return super().check_noun_args(running, policy_name=policy_name, **kwargs)
 
     async def get(self, running, policy_name=None, filter_path=None):
-        val = await self.api.escnx.ilm.get_lifecycle(policy=policy_name)
+        val = await self.api.escnx.ilm.get_lifecycle(policy=policy_name, filter_path=filter_path)
         return val
 
 
@@ -66,6 +67,46 @@ class PoliciesPut(Verb):
         return "%s added" % running.policy_name
 
 
+@command(PoliciesDispatcher, verb='sync')
+class PoliciesSync(SyncVerb):
+    """
+    Put the lifecycle policies from the files of a directory, named after the files, only if they changed
+    """
+
+    # The default values of the actions that Elasticsearch returns explicitly
+    action_defaults = {
+        'allocate': {'include': {}, 'exclude': {}, 'require': {}},
+        'delete': {'delete_searchable_snapshot': True},
+        'migrate': {'enabled': True},
+        'searchable_snapshot': {'force_merge_index': True},
+    }
+
+    def policy(self, body):
+        # A file can contain the policy alone, the existing ones also have a version and a modified_date
+        return body['policy'] if 'policy' in body else body
+
+    def canonical(self, running, body):
+        policy = dict(self.policy(body))
+        phases = {}
+        for (name, phase) in (policy.get('phases') or {}).items():
+            # The default min_age is returned explicitly
+            phase = dict({'min_age': '0ms', 'actions': {}}, **phase)
+            phase['actions'] = {k: dict(self.action_defaults.get(k, {}), **(v or {})) for (k, v) in (phase['actions'] or {}).items()}
+            phases[name] = phase
+        policy['phases'] = phases
+        return normalize(policy)
+
+    def can_delete(self, running, name):
+        managed = (self.existing(running)[name].get('policy', {}).get('_meta') or {}).get('managed', False)
+        return super().can_delete(running, name) and not managed
+
+    async def put(self, name, body, running):
+        return await self.api.escnx.ilm.put_lifecycle(policy=name, body={'policy': self.policy(body)})
+
+    async def delete(self, name, running):
+        return await self.api.escnx.ilm.delete_lifecycle(policy=name)
+
+
 @command(PoliciesDispatcher, verb='delete')
 class PoliciesDelete(RepeterVerb):
 
@@ -0,0 +1,116 @@
+import json
+import sys
+import time
+from asyncio import sleep
+
+
+class Progress(object):
+    """
+    Report the progress of a RepeterVerb run on stderr. On a terminal, a status line is updated in place, otherwise a
+    json line is written periodically, even if nothing finished, so a stuck run can be told from a slow one.
+    The ETA uses a moving average of the elements latency.
+    """
+
+    tty_interval = 0.5
+    log_interval = 10.0
+    # The weight of a new latency in the moving average
+    smoothing = 0.2
+
+    def __init__(self, counters=None, total=None, stream=None):
+        self.counters = counters
+        self.total = total
+        self._stream = stream
+        self.tty = self.stream.isatty()
+        self.interval = self.tty_interval if self.tty else self.log_interval
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.in_flight = 0
+        self.latency = None
+        self.displayed = False
+        self.start = time.monotonic()
+        self.last = (self.start, ) + self._counters()
+
+    @property
+    def stream(self):
+        # stderr is read when used, so a redirection done after the import is followed
+        return sys.stderr if self._stream is None else self._stream
+
+    def _counters(self):
+        # The request and bytes counters of the connection, if it provides them
+        if self.counters is None or not hasattr(self.counters, 'requests'):
+            return (0, 0)
+        return (self.counters.requests, self.counters.sent_bytes + self.counters.received_bytes)
+
+    def started(self, count=1):
+        self.in_flight += count
+
+    def finished(self, latency, count=1, failed=0):
+        self.in_flight -= count
+        self.completed += count - failed
+        self.failed += failed
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+    def skip(self, count=1):
+        self.skipped += count
+
+    def eta(self):
+        if self.total is None or self.latency is None:
+            return None
+        remaining = self.total - self.completed - self.failed - self.skipped
+        return max(0.0, remaining * self.latency / max(1, self.in_flight))
+
+    def status(self):
+        now = time.monotonic()
+        requests, transferred = self._counters()
+        (last_time, last_requests, last_transferred) = self.last
+        elapsed = max(now - last_time, 1e-6)
+        self.last = (now, requests, transferred)
+        status = {
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'requests_per_s': round((requests - last_requests) / elapsed, 1),
+            'bytes_per_s': int((transferred - last_transferred) / elapsed),
+            'elapsed': round(now - self.start, 1),
+        }
+        if self.skipped > 0:
+            status['skipped'] = self.skipped
+        if self.total is not None:
+            status['total'] = self.total
+        eta = self.eta()
+        if eta is not None:
+            status['eta'] = round(eta, 1)
+        return status
+
+    def report(self):
+        status = self.status()
+        if self.tty:
+            line = ' '.join('%s=%s' % (k, v) for (k, v) in status.items())
+            self.stream.write('\r\x1b[K%s' % line)
+            self.displayed = True
+        else:
+            self.stream.write('%s\n' % json.dumps({'progress': status}))
+        self.stream.flush()
+
+    def clear(self):
+        # Removes the status line, so a result can be printed
+        if self.displayed:
+            self.stream.write('\r\x1b[K')
+            self.stream.flush()
+            self.displayed = False
+
+    async def run(self):
+        while True:
+            await sleep(self.interval)
+            self.report()
+
+    def close(self):
+        self.report()
+        if self.tty:
+            self.stream.write('\n')
+            self.stream.flush()
+            self.displayed = False
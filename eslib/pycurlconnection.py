@@ -6,7 +6,7 @@ from elasticsearch.compat import urlencode
 import re
 import sys
 import time
-from asyncio import Queue, QueueEmpty, get_event_loop, wait_for, TimeoutError, wait, create_task
+from asyncio import Queue, QueueEmpty, get_event_loop, wait_for, TimeoutError, wait, create_task, CancelledError
 import json
 import logging
 from eslib.exceptions import PyCurlException
@@ -242,24 +242,45 @@ class PyCurlMultiHander(object):
         self.waiting_handles = Queue()
         self.running = True
         self.maxactive = maxactive
+        # Counters of the finished requests and their sizes
+        self.requests = 0
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        # The sizes of the responses by endpoint, if kept
+        self.history = None
 
     async def query(self, handle, future):
         def manage_callback(status, headers, data):
             handle.close()
-            future.set_result((status, headers, data))
+            if not future.done():
+                future.set_result((status, headers, data))
 
         def failed_callback(ex):
             handle.close()
-            future.set_exception(ex)
+            if not future.done():
+                future.set_exception(ex)
 
         handle.cb = manage_callback
         handle.f_cb = failed_callback
+        handle.future = future
 
         # put the query in the waiting queue, that launch it if possible
         # and wait for the processing to be finished
-        await wait((future,create_task(self.waiting_handles.put(handle))))
+        try:
+            await wait((future,create_task(self.waiting_handles.put(handle))))
+        except CancelledError:
+            # The query is abandoned, it will be dropped if still waiting
+            future.cancel()
+            raise
         return future
 
+    def _count(self, handle):
+        self.requests += 1
+        self.sent_bytes += int(handle.getinfo(pycurl.SIZE_UPLOAD_T))
+        self.received_bytes += int(handle.getinfo(pycurl.SIZE_DOWNLOAD_T))
+        if self.history is not None and 200 <= handle.getinfo(pycurl.RESPONSE_CODE) < 300:
+            self.history.record(handle.method, handle.path, int(handle.getinfo(pycurl.SIZE_DOWNLOAD_T)))
+
     def close(self):
         self.multi.close()
         self.share.close()
@@ -281,6 +302,9 @@ class PyCurlMultiHander(object):
                     handler = self.waiting_handles.get_nowait()
                 # only wait once
                 wait = False
+                if handler.future.cancelled():
+                    handler.close()
+                    continue
                 # needed to keep reference count
                 self.handles.add(handler)
                 self.multi.add_handle(handler)
@@ -325,6 +349,7 @@ class PyCurlMultiHander(object):
                 (waiting, succeded, failed) = self.multi.info_read()
                 for handle in succeded:
                     self.handles.remove(handle)
+                    self._count(handle)
                     status = handle.getinfo(pycurl.RESPONSE_CODE)
                     self.multi.remove_handle(handle)
                     content_type, decoded = decode_body(handle)
@@ -337,6 +362,7 @@ class PyCurlMultiHander(object):
                         handle.f_cb(return_error(status, decoded, content_type, http_message=handle.headers.pop('__STATUS__'), url=handle.getinfo(pycurl.EFFECTIVE_URL)))
                 for handle, code, message in failed:
                     self.handles.remove(handle)
+                    self._count(handle)
                     self.multi.remove_handle(handle)
                     if code == pycurl.E_OPERATION_TIMEDOUT:
                         ex = ConnectionTimeout(code, message, handle.getinfo(pycurl.EFFECTIVE_URL), handle.getinfo(pycurl.TOTAL_TIME))
@@ -517,6 +543,7 @@ class PyCurlConnection(Connection):
 
     def perform_request(self, method, url, params=None, body=None, headers={}, ignore=(), future=None, timeout=None):
         url = self.url_prefix + url
+        path = url
         if params is not None:
             url = '%s?%s' % (url, urlencode(params))
         full_url = self.host + url
@@ -544,6 +571,8 @@ class PyCurlConnection(Connection):
         curl_handle.setopt(pycurl.CUSTOMREQUEST, method)
         if future is not None:
             curl_handle.connection = self
+            curl_handle.method = method
+            curl_handle.path = path
             return self.multi_handle.query(curl_handle, future)
         else:
             start = time.time()
@@ -0,0 +1,120 @@
+import time
+from asyncio import Lock, sleep
+
+# The endpoints that update the cluster state, by the first segments of their path
+endpoint_classes = {
+    '_settings': 'settings',
+    '_cluster/settings': 'settings',
+    '_mapping': 'mapping',
+    '_mappings': 'mapping',
+    '_template': 'template',
+    '_index_template': 'template',
+    '_component_template': 'template',
+    '_ilm/policy': 'policy',
+    '_aliases': 'aliases',
+    '_alias': 'aliases',
+    '_cluster/reroute': 'reroute',
+}
+
+
+def endpoint_class(method, url):
+    """
+    The class of an endpoint that send a cluster state update to the master, or None
+    """
+    if method in ('GET', 'HEAD'):
+        return None
+    segments = [s for s in url.split('?', 1)[0].split('/') if s != '']
+    if len(segments) == 0:
+        return None
+    elif not segments[0].startswith('_'):
+        # The path starts with index names, whatever they are, the API is the next segment
+        if len(segments) == 1:
+            # A whole index
+            return {'DELETE': 'delete', 'PUT': 'create'}.get(method)
+        segments = segments[1:2]
+    return endpoint_classes.get('/'.join(segments[0:2]), endpoint_classes.get(segments[0]))
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                await sleep((1 - self.tokens) / self.rate)
+                self.tokens = 0
+                self.updated = time.monotonic()
+            else:
+                self.tokens -= 1
+
+
+async def wait_pending_tasks(transport, threshold, interval=1.0):
+    """
+    Wait until the master has no more than threshold cluster state updates waiting
+    """
+    while True:
+        pending = await transport.perform_request('GET', '/_cluster/pending_tasks', headers={}, params={'filter_path': 'tasks.insert_order'})
+        if len(pending.get('tasks', [])) <= threshold:
+            return
+        await sleep(interval)
+
+
+class RateLimitTransport(object):
+    """
+    Wraps the transport of the client, the requests that update the cluster state are sent at the rate given for
+    their endpoint class in the [ratelimit] section of the configuration, like:
+
+        [ratelimit]
+        settings = 5
+        delete = 0.5
+        burst = 2
+        pending_tasks = 50
+
+    If pending_tasks is given, the pending tasks of the master are checked before each of them, at most once per
+    pending_interval, and they wait until the queue is short enough.
+    """
+
+    def __init__(self, transport, settings):
+        self.transport = transport
+        self.threshold = None
+        self.interval = 1.0
+        self.checked = None
+        self.pending_lock = Lock()
+        burst = float(settings.get('burst', 1))
+        self.buckets = {}
+        for (k, v) in settings.items():
+            if k == 'pending_tasks':
+                self.threshold = int(v)
+            elif k == 'pending_interval':
+                self.interval = float(v)
+            elif k != 'burst':
+                self.buckets[k] = TokenBucket(float(v), burst)
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    async def _check_pending(self):
+        async with self.pending_lock:
+            now = time.monotonic()
+            if self.checked is not None and now - self.checked < self.interval:
+                return
+            await wait_pending_tasks(self.transport, self.threshold, self.interval)
+            self.checked = time.monotonic()
+
+    async def perform_request(self, method, url, headers=None, params=None, body=None):
+        limited = endpoint_class(method, url)
+        if limited is not None:
+            if limited in self.buckets:
+                await self.buckets[limited].acquire()
+            if self.threshold is not None:
+                await self._check_pending()
+        return await self.transport.perform_request(method, url, headers=headers, params=params, body=body)
@@ -3,3 +3,7 @@ class Running(object):
     def __init__(self, cmd, object=None):
         self.cmd = cmd
         self.object = object
+        # The elements given by the previous phrase of a pipeline
+        self.upstream = None
+        # The arguments given to the verb
+        self.verb_args = ()
@@ -129,7 +129,7 @@ class ShardsTree(Verb):
         return tree
 
     def to_str(self, running, value):
-        return '%s' % value
+        return value.lines()
 
 
 @command(ShardsDispatcher)
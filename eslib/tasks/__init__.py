@@ -23,6 +23,20 @@ class TasksDispatcher(Dispatcher):
 
 
 class TaskTreeNode(TreeNode):
+    """
+    A task in the tree, its value is the task id. Only the fields that are shown are kept, not the whole task
+    """
+    __slots__ = ('parent_id', 'node_name', 'action', 'description', 'running_time_in_nanos')
+
+    def __init__(self, task_id=None, task=None, node_name=''):
+        super().__init__(task_id)
+        if task is not None:
+            self.parent_id = task.get('parent_task_id', '')
+            self.node_name = node_name
+            self.action = task.get('action', '')
+            self.description = task.get('description', '')
+            self.running_time_in_nanos = int(task.get('running_time_in_nanos', -1))
+
     patterns = {
         'indices:data/write/update/byquery': (
             re.compile('^update-by-query \\[(.*)\\] updated with Script.*$', re.DOTALL),
@@ -48,10 +62,10 @@ class TaskTreeNode(TreeNode):
     update_by_query_re = re.compile('^update-by-query \\[(.*)\\] updated with Script.*$', re.DOTALL)
     retention_lease_background_sync_re = re.compile('^retention_lease_background_sync shardId=(\\[.*\\]\\[\\d+\\])$', re.DOTALL)
     def _value_to_str(self, level):
-        node_name = self.value.get('node_name', '')
-        running_time_in_nanos = int(self.value.get('running_time_in_nanos', -1))
-        action = self.value.get('action', '')
-        description = self.value.get('description', '')
+        node_name = self.node_name
+        running_time_in_nanos = self.running_time_in_nanos
+        action = self.action
+        description = self.description
         if action in TaskTreeNode.patterns:
             matcher = re.fullmatch(TaskTreeNode.patterns[action][0], description)
             if matcher is not None:
@@ -87,52 +101,41 @@ class TasksTree(Verb):
         return val
 
     async def execute(self, running):
-        tree = TaskTreeNode(None)
-        nodes = { '' : tree }
-        try_parent = { '' : None }
-        task_infos = {}
-        for node, node_info in running.object['nodes'].items():
+        # The nodes of the tasks by parent, in the order of the response
+        children = {}
+        for node_info in running.object['nodes'].values():
             node_name = node_info['name']
-            tasks = node_info['tasks']
-            for task in tasks.values():
-                id = task['id']
-                node = task['node']
-                task_key = "%s:%s" % (node, id)
-                try_parent[task_key] = task.get('parent_task_id', '')
-                task['node_name'] = node_name
-                task_infos[task_key] = task
-        while len(try_parent) > 0:
-            next_try_parent = {}
-            for node, parent in try_parent.items():
-                if parent in nodes:
-                    node_tree = TaskTreeNode(task_infos[node])
-                    nodes[parent].addchild(node_tree)
-                    nodes[node] = node_tree
-                elif parent is not None:
-                    next_try_parent[node] = parent
-            if len(try_parent) == len(next_try_parent):
-                nodes = {}
-                actions = {}
-
-                max_running_time_in_nanos = 0
-                for task_index in try_parent.keys():
-                    task_info = task_infos[task_index]
-                    max_running_time_in_nanos = max(int(task_info.get('running_time_in_nanos', -1)), max_running_time_in_nanos)
-                    node_name = task_info['node_name']
-                    action = task_info['action']
-                    nodes[node_name] = nodes.get(node_name, 0) + 1
-                    actions[action] = actions.get(action, 0) + 1
-
-                max_running_time = datetime.timedelta(seconds=int(max_running_time_in_nanos / 1e9))
-                print('Orphaned tasks by node: ', nodes)
-                print('Orphaned tasks by action: ', actions)
-                print('Oldest orphaned task: ', max_running_time)
-                break
-            try_parent = next_try_parent
+            for task in node_info['tasks'].values():
+                node_tree = TaskTreeNode("%s:%s" % (task['node'], task['id']), task, node_name)
+                children.setdefault(node_tree.parent_id, []).append(node_tree)
+        # A single walk from the root, the lists of the index become the children of the nodes
+        tree = TaskTreeNode(None)
+        tree.children = children.pop('', [])
+        pending = [tree]
+        while len(pending) > 0:
+            node_tree = pending.pop()
+            for child_tree in node_tree.children:
+                child_tree.parent = node_tree
+                child_tree.children = children.pop(child_tree.value, child_tree.children)
+                pending.append(child_tree)
+        # The tasks not reached from the root are orphans, or children of orphans
+        if len(children) > 0:
+            nodes = {}
+            actions = {}
+            max_running_time_in_nanos = 0
+            for orphans in children.values():
+                for orphan in orphans:
+                    max_running_time_in_nanos = max(orphan.running_time_in_nanos, max_running_time_in_nanos)
+                    nodes[orphan.node_name] = nodes.get(orphan.node_name, 0) + 1
+                    actions[orphan.action] = actions.get(orphan.action, 0) + 1
+            max_running_time = datetime.timedelta(seconds=int(max_running_time_in_nanos / 1e9))
+            print('Orphaned tasks by node: ', nodes)
+            print('Orphaned tasks by action: ', actions)
+            print('Oldest orphaned task: ', max_running_time)
         return tree
 
     def to_str(self, running, value):
-        return '%s' % value
+        return value.lines()
 
 
 @command(TasksDispatcher, verb='dump')
@@ -144,15 +147,12 @@ class TaskDump(DumpVerb):
         return super().check_verb_args(running, *args, **kwargs)
 
     async def get_elements(self, running):
-        tasks_dict = {}
         for node, node_info in running.object['nodes'].items():
             tasks = node_info['tasks']
             for task in tasks.values():
                 id = task['id']
                 node = task['node']
-                task_key = "%s:%s" % (node, id)
-                tasks_dict[task_key] = task
-        return tasks_dict.items()
+                yield ("%s:%s" % (node, id), task)
 
 
 @command(TasksDispatcher)
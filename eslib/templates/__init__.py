@@ -1,4 +1,5 @@
-from eslib.verb import Verb, List, DumpVerb, RepeterVerb, CatVerb
+from eslib.verb import Verb, List, DumpVerb, RepeterVerb, SyncVerb, CatVerb
+from eslib import normalize
 from eslib.dispatcher import dispatcher, command, Dispatcher
 from eslib.context import TypeHandling
 from yaml import load
@@ -8,7 +9,7 @@ except ImportError:
     from yaml import Loader
 
 
-@dispatcher(object_name="template", default_filter_path='*.order')
+@dispatcher(object_name="template", default_filter_path='*.order', element_filter_path='*')
 class TemplatesDispatcher(Dispatcher):
 
     def fill_parser(self, parser):
@@ -79,6 +80,39 @@ class TemplatesPut(Verb):
     def to_str(self, running, value):
         return "%s added" % running.template_name
 
+@command(TemplatesDispatcher, verb='sync')
+class TemplatesSync(SyncVerb):
+    """
+    Put the templates from the files of a directory, named after the files, only if they changed
+    """
+
+    async def get(self, running, template_name=None, filter_path=None):
+        # All the existing templates, with a single request
+        return await self.dispatcher.get(running, template_name=template_name)
+
+    def canonical(self, running, body):
+        settings = {}
+        for k, v in self.flatten(body.get('settings') or {}).items():
+            settings[k if k.startswith('index.') else 'index.' + k] = v
+        index_patterns = body.get('index_patterns', body.get('template'))
+        if isinstance(index_patterns, str):
+            index_patterns = [index_patterns]
+        return normalize({
+            'index_patterns': index_patterns,
+            'order': body.get('order', 0),
+            'version': body.get('version'),
+            'settings': settings,
+            'mappings': body.get('mappings') or {},
+            'aliases': body.get('aliases') or {},
+        })
+
+    async def put(self, name, body, running):
+        return await self.api.escnx.indices.put_template(name=name, body=body)
+
+    async def delete(self, name, running):
+        return await self.api.escnx.indices.delete_template(name=name)
+
+
 """
 delete_template(*args, **kwargs)
 Delete an index template by its name. http://www.elastic.co/guide/en/elasticsearch/reference/current/indices-templates.html
@@ -1,4 +1,5 @@
 class TreeNode(object):
+    __slots__ = ('value', 'parent', 'children')
 
     identation = 2
 
@@ -12,13 +13,16 @@ class TreeNode(object):
         child.parent = self
 
     def __repr__(self, level=-1):
+        return ''.join("%s\n" % l for l in self.lines(level))
+
+    def lines(self, level=-1):
+        """
+        A generator of the lines of the tree, so it's never fully converted to a single string
+        """
         if self.value is not None:
-            ret = " "* TreeNode.identation * level + self._value_to_str(level)+"\n"
-        else:
-            ret = ''
+            yield " "* TreeNode.identation * level + self._value_to_str(level)
         for child in self.children:
-            ret += child.__repr__(level+1)
-        return ret
+            yield from child.lines(level+1)
 
     def _value_to_str(self, level):
         raise NotImplementedError
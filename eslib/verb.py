@@ -6,10 +6,17 @@ try:
 except ImportError:
     from yaml import Loader, Dumper
 import collections
+import os
 import re
-from asyncio import ensure_future, wait
+import time
+from inspect import isawaitable
+from asyncio import ensure_future, wait, gather, get_running_loop, Semaphore, FIRST_COMPLETED
 from elasticsearch.exceptions import TransportError, ElasticsearchException
 from eslib.exceptions import resolve_exception, ESLibError
+from eslib import normalize
+from eslib.progress import Progress
+from eslib.plan import planning, PlannedRequest
+from eslib.ratelimit import wait_pending_tasks
 
 # Find the best implementation available on this platform
 try:
@@ -19,7 +26,11 @@ except:
 
 
 class Verb(object):
-    """A abstract class, used to implements actual verb"""
+    """
+    A abstract class, used to implements actual verb.
+    get and execute are coroutines, to_str returns a string or a generator of strings. Each of them can also be an
+    asynchronous generator, the values are then consumed as they are produced, so the whole output is never in memory.
+    """
     def __init__(self, dispatcher):
         self.api = dispatcher.api
         self.dispatcher = dispatcher
@@ -47,6 +58,12 @@ class Verb(object):
     def check_verb_args(self, running, *args, **kwargs):
         return kwargs
 
+    def upstream_element(self, name, value):
+        """
+        Convert a result of the previous phrase in a pipeline to an element
+        """
+        return (name, value)
+
     async def get(self, running, **kwargs):
         return await self.dispatcher.get(running, **kwargs)
 
@@ -82,44 +99,320 @@ class Verb(object):
         flatten_data(y)
         return out
 
+    def unflatten(self, flat):
+        out = {}
+        for k, v in flat.items():
+            curs = out
+            path = k.split('.')
+            for i in path[:-1]:
+                curs = curs.setdefault(i, {})
+            curs[path[-1]] = v
+        return out
+
 class RepeterVerb(Verb):
 
+    # How many actions can be running at the same time, can be overridden with the --inflight option
+    in_flight = 32
+
+    # If true, the elements are sent by chunks to batch_action, and the response is split back with split_result
+    batched = False
+
+    # The maximum length of the comma separated list of element names used in a batched request, None to send all the
+    # elements in a single batch
+    max_url_length = 3000
+
+    # If true, the GET and HEAD requests of the actions are sent with --plan, as they are needed to know what the
+    # actions would change, only the other requests are planned
+    reads_before_writes = False
+
     async def execute(self, running, *args, **kwargs):
         try:
-            elements = await self.get_elements(running)
+            if running.upstream is not None:
+                elements = running.upstream
+            else:
+                elements = self.get_elements(running)
+            if isawaitable(elements):
+                elements = await elements
         except Exception as ex:
             # ex needs to be passed as argument
-            def enumerator(ex):
+            async def enumerator(ex):
                 ex.source = object
                 yield ex
             return enumerator(ex)
-        coros = []
-        for e in elements:
-            task = ensure_future(self.action(e, running))
-            task.element = e
-            coros.append(task)
-        if len(coros) > 0:
-            done, _ = await wait(coros)
-            def enumerator():
-                for i in done:
-                    if i.exception() is not None:
-                        ex = i.exception()
-                        ex.context = (type(ex), ex, ex.__traceback__)
-                        if isinstance(ex, TransportError):
-                            yield resolve_exception(ex)
-                        else:
-                            yield ex
-                    else:
-                        yield (i.element, i.result())
-            return enumerator()
+        return self._results(running, elements)
+
+    def in_flight_limit(self):
+        if self.api.in_flight is not None:
+            return max(1, self.api.in_flight)
+        else:
+            return self.in_flight
+
+    async def _iterate(self, elements):
+        # get_elements can return an usual iterable or an asynchronous iterator
+        if hasattr(elements, '__aiter__'):
+            async for e in elements:
+                yield e
+        elif elements is not None:
+            for e in elements:
+                yield e
+
+    async def _chunks(self, source):
+        # Group the elements, so the joined names of each chunk stay below max_url_length
+        chunk = []
+        length = 0
+        try:
+            async for e in source:
+                if isinstance(e, Exception):
+                    yield e
+                    continue
+                name_length = len(self.element_name(e)) + 1
+                if len(chunk) > 0 and self.max_url_length is not None and length + name_length > self.max_url_length:
+                    yield chunk
+                    chunk = []
+                    length = 0
+                chunk.append(e)
+                length += name_length
+            if len(chunk) > 0:
+                yield chunk
+        finally:
+            await source.aclose()
+
+    def _start_action(self, element, running):
+        if self.batched:
+            action = self._batch(element, running)
         else:
+            action = self.action(element, running)
+        if self.api.plan is not None:
+            action = self._planned(action)
+        task = ensure_future(action)
+        task.element = element
+        task.started = time.monotonic()
+        return task
+
+    async def _planned(self, action):
+        # The context of the task is its own, so only the requests of this action are planned
+        planning.set('writes' if self.reads_before_writes else 'all')
+        return await action
+
+    async def _batch(self, elements, running):
+        try:
+            response = await self.batch_action(elements, running)
+        except TransportError as ex:
+            if isinstance(ex.status_code, int) and 400 <= ex.status_code < 500:
+                # Some elements are refused, resend them one by one to know which ones
+                response = None
+            else:
+                raise
+        results = [None] * len(elements)
+        missing = []
+        for (i, e) in enumerate(elements):
+            try:
+                if response is None:
+                    raise KeyError(self.element_name(e))
+                results[i] = self.split_result(e, response, running)
+            except KeyError:
+                missing.append(i)
+        if len(missing) > 0:
+            fallback = await gather(*[self._fallback(elements[i], running) for i in missing], return_exceptions=True)
+            for (i, result) in zip(missing, fallback):
+                results[i] = result
+        return list(zip(elements, results))
+
+    async def _fallback(self, element, running):
+        # The elements resent alone share the limit of the run, a refused chunk doesn't send all of them at once
+        async with running.fallback_slots:
+            return await self.action(element, running)
+
+    def _resolve(self, ex):
+        ex.context = (type(ex), ex, ex.__traceback__)
+        if isinstance(ex, TransportError):
+            return resolve_exception(ex)
+        else:
+            return ex
+
+    def _task_results(self, task):
+        if task.exception() is not None:
+            # A failed batch is reported once, not for each of its elements
+            yield self._resolve(task.exception())
+        elif self.batched:
+            for (e, result) in task.result():
+                if isinstance(result, Exception):
+                    yield self._resolve(result)
+                else:
+                    yield (e, result)
+        else:
+            yield (task.element, task.result())
+
+    async def _skip_done(self, journal, running, source, progress):
+        # Elements already done in a previous run
+        try:
+            async for e in source:
+                if isinstance(e, Exception) or not journal.is_done(self.dispatcher.object_name, self.verb, running.verb_args, self.element_name(e)):
+                    yield e
+                elif progress is not None:
+                    progress.skip()
+        finally:
+            await source.aclose()
+
+    def _element_results(self, task):
+        # The result or the exception of each element of a finished task
+        if task.exception() is not None and self.batched:
+            return [(e, task.exception()) for e in task.element]
+        elif task.exception() is not None:
+            return [(task.element, task.exception())]
+        elif self.batched:
+            return task.result()
+        else:
+            return [(task.element, task.result())]
+
+    def _journal_error(self, result):
+        # None for a success, a result refused by result_is_valid is a failure too
+        if isinstance(result, Exception):
+            return str(result)
+        elif self.result_is_valid(result):
             return None
+        else:
+            return json.dumps(result, default=str)
+
+    def _progress(self, running, elements):
+        if not self.api.progress:
+            return None
+        total = len(elements) if hasattr(elements, '__len__') else None
+        return Progress(getattr(self.api, 'multi_handle', None), total=total)
+
+    async def _results(self, running, elements):
+        """
+        Elements are read only when a slot is available for a new action. Results are yield as soon as each action
+        is finished, or in the elements order if --ordered is given. In this case, the limit includes the finished
+        actions waiting for a slower predecessor.
+        """
+        limit = self.in_flight_limit()
+        ordered = self.api.ordered
+        pending = collections.deque() if ordered else set()
+        journal = self.api.journal
+        if self.api.plan is not None:
+            # Nothing is done, so nothing to record
+            journal = None
+            self.api.plan.in_flight = limit
+        progress = self._progress(running, elements)
+        source = self._iterate(elements)
+        if journal is not None:
+            source = self._skip_done(journal, running, source, progress)
+        if self.batched:
+            source = self._chunks(source)
+            running.fallback_slots = Semaphore(limit)
+        exhausted = False
+        if progress is not None:
+            self.api.progress_reporter = progress
+            reporter = ensure_future(progress.run())
+        try:
+            while True:
+                while not exhausted and len(pending) < limit:
+                    try:
+                        e = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    except Exception as ex:
+                        exhausted = True
+                        ex.source = object
+                        yield ex
+                        break
+                    if isinstance(e, Exception):
+                        # An error given by the previous phrase of a pipeline
+                        yield e
+                        continue
+                    if ordered:
+                        pending.append(self._start_action(e, running))
+                    else:
+                        pending.add(self._start_action(e, running))
+                    if progress is not None:
+                        progress.started(len(e) if self.batched else 1)
+                if len(pending) == 0:
+                    break
+                if ordered:
+                    # Removed once finished, so it's still cancelled by the finally if the wait is interrupted
+                    await wait((pending[0], ))
+                    done = (pending.popleft(), )
+                else:
+                    done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if isinstance(task.exception(), PlannedRequest):
+                        continue
+                    results = self._element_results(task)
+                    for (e, result) in results:
+                        self.count(running, e, result)
+                    if journal is not None:
+                        for (e, result) in results:
+                            journal.record(self.dispatcher.object_name, self.verb, running.verb_args, self.element_name(e), self._journal_error(result))
+                    if progress is not None:
+                        failed = sum(1 for (_, result) in results if isinstance(result, Exception))
+                        progress.finished(time.monotonic() - task.started, len(results), failed)
+                    for result in self._task_results(task):
+                        yield result
+            summary = self.summary(running)
+            if summary is not None:
+                yield summary
+        finally:
+            # Stop every started actions and wait for them to be finished, so no request is left behind
+            for task in pending:
+                task.cancel()
+            if len(pending) > 0:
+                await wait(pending)
+            await source.aclose()
+            if progress is not None:
+                reporter.cancel()
+                progress.close()
+                self.api.progress_reporter = None
 
     async def action(self, element, running):
         raise NotImplementedError
 
+    def count(self, running, element, result):
+        """
+        Called with the result or the exception of each element, to build the summary
+        """
+        pass
+
+    def summary(self, running):
+        """
+        A line given once all the elements are done, or None
+        """
+        return None
+
+    async def batch_action(self, elements, running):
+        """
+        Run the action for a chunk of elements in a single request, the response is given to split_result
+        """
+        raise NotImplementedError
+
+    def split_result(self, element, response, running):
+        """
+        Extract the result of one element from the response of batch_action, raise KeyError if it's missing,
+        the element will then be run alone with action
+        """
+        raise NotImplementedError
+
+    def element_name(self, element):
+        return element[0]
+
+    def where_values(self, running, element, result):
+        """
+        The values that --where conditions can check for a result
+        """
+        if isinstance(result, dict):
+            return self.flatten(result)
+        else:
+            return {}
+
+    def joined_names(self, elements):
+        return ','.join(self.element_name(e) for e in elements)
+
     async def get_elements(self, running):
-        return running.object.items()
+        if hasattr(running.object, '__aiter__'):
+            return running.object
+        else:
+            return running.object.items()
 
     def to_str(self, running, value):
         if value[0] is not None:
@@ -135,12 +428,189 @@ class RepeterVerb(Verb):
             return "%s -> %s" % (name, json.dumps(result))
 
     def result_is_valid(self, result):
-        return not isinstance(result, (ElasticsearchException, ESLibError)) and result.get('acknowledged', False)
+        return isinstance(result, dict) and result.get('acknowledged', False)
 
     def format(self, running, name, result):
         raise NotImplementedError
 
 
+class BatchedUpdate(RepeterVerb):
+    """
+    The current state of a chunk of elements is read, the elements that already have the wanted values are skipped,
+    and the others are updated with a single request, as it's the same update for all of them.
+    """
+    batched = True
+    reads_before_writes = True
+
+    def fill_parser(self, parser):
+        super().fill_parser(parser)
+        parser.add_option("--max_pending", dest="max_pending", help="Wait for the master to have at most that many pending tasks before each update", default=None, type=int)
+
+    def check_verb_args(self, running, *args, max_pending=None, **kwargs):
+        running.max_pending = max_pending
+        running.counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+        return super().check_verb_args(running, *args, **kwargs)
+
+    async def read_current(self, elements, running):
+        """
+        The current state of each element, by name. A missing element is updated alone
+        """
+        raise NotImplementedError
+
+    def is_unchanged(self, running, current):
+        raise NotImplementedError
+
+    async def update(self, elements, running):
+        raise NotImplementedError
+
+    async def _update(self, elements, running):
+        if running.max_pending is not None:
+            await wait_pending_tasks(self.api.escnx.transport, running.max_pending)
+        return await self.update(elements, running)
+
+    async def batch_action(self, elements, running):
+        current = await self.read_current(elements, running)
+        changed = []
+        unchanged = set()
+        for e in elements:
+            name = self.element_name(e)
+            if name in current and self.is_unchanged(running, current[name]):
+                unchanged.add(name)
+            elif name in current:
+                changed.append(e)
+        result = None
+        if len(changed) > 0:
+            result = await self._update(changed, running)
+        return {'changed': frozenset(self.element_name(e) for e in changed), 'unchanged': unchanged, 'result': result}
+
+    def split_result(self, element, response, running):
+        name = self.element_name(element)
+        if name in response['unchanged']:
+            return {'acknowledged': True, 'unchanged': True}
+        elif name in response['changed']:
+            return response['result']
+        else:
+            raise KeyError(name)
+
+    async def action(self, element, running):
+        return await self._update([element], running)
+
+    def count(self, running, element, result):
+        if isinstance(result, Exception) or not self.result_is_valid(result):
+            running.counts['failed'] += 1
+        elif result.get('unchanged', False):
+            running.counts['unchanged'] += 1
+        else:
+            running.counts['changed'] += 1
+
+    def summary(self, running):
+        return "%(changed)d changed, %(unchanged)d unchanged, %(failed)d failed" % running.counts
+
+
+class SyncVerb(RepeterVerb):
+    """
+    Make the objects match the files of a directory, each file is an object named after the file. Only the objects
+    that differ from their file are written.
+    """
+    in_flight = 8
+    file_extensions = ('.yaml', '.yml', '.json')
+
+    def fill_parser(self, parser):
+        super().fill_parser(parser)
+        parser.add_option("-d", "--directory", dest="directory", help="The directory with a file for each object", default=None)
+        parser.add_option("--delete", dest="delete", help="Delete the objects without a file", default=False, action='store_true')
+        parser.add_option("--dry_run", dest="dry_run", help="Only show the differences", default=False, action='store_true')
+
+    def check_verb_args(self, running, *args, directory=None, delete=False, dry_run=False, **kwargs):
+        if directory is None:
+            raise ESLibError("-d/--directory mandatory is not defined")
+        running.directory = directory
+        running.delete = delete
+        running.dry_run = dry_run
+        running.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'failed': 0}
+        return super().check_verb_args(running, *args, **kwargs)
+
+    def load_file(self, file_name):
+        # yaml also reads json
+        with open(file_name, 'r', encoding='utf-8') as object_file:
+            return load(object_file, Loader=Loader)
+
+    async def get_elements(self, running):
+        file_names = sorted(f for f in os.listdir(running.directory) if os.path.splitext(f)[1] in self.file_extensions)
+        loop = get_running_loop()
+        bodies = await gather(*[loop.run_in_executor(None, self.load_file, os.path.join(running.directory, f)) for f in file_names])
+        elements = [(os.path.splitext(f)[0], body) for (f, body) in zip(file_names, bodies)]
+        if running.delete:
+            wanted = {e[0] for e in elements}
+            elements.extend((name, None) for name in self.existing(running) if name not in wanted and self.can_delete(running, name))
+        return elements
+
+    def existing(self, running):
+        """
+        The current objects, by name
+        """
+        return running.object
+
+    def can_delete(self, running, name):
+        # The objects managed by Elasticsearch itself are kept
+        return not name.startswith('.')
+
+    def canonical(self, running, body):
+        return normalize(body)
+
+    async def put(self, name, body, running):
+        raise NotImplementedError
+
+    async def delete(self, name, running):
+        raise NotImplementedError
+
+    def differences(self, current, wanted):
+        current = self.flatten(current) if current is not None else {}
+        wanted = self.flatten(wanted) if wanted is not None else {}
+        return [(k, current.get(k), wanted.get(k)) for k in sorted(set(current.keys()) | set(wanted.keys())) if current.get(k) != wanted.get(k)]
+
+    async def action(self, element, running):
+        name, body = element
+        current = self.existing(running).get(name)
+        current = None if current is None else self.canonical(running, current)
+        wanted = None if body is None else self.canonical(running, body)
+        if body is None:
+            status = 'deleted'
+        elif current == wanted:
+            return {'status': 'unchanged'}
+        elif current is None:
+            status = 'created'
+        else:
+            status = 'updated'
+        if running.dry_run:
+            return {'status': status, 'differences': self.differences(current, wanted)}
+        elif body is None:
+            await self.delete(name, running)
+        else:
+            await self.put(name, body, running)
+        return {'status': status}
+
+    def result_is_valid(self, result):
+        return isinstance(result, dict) and 'status' in result
+
+    def count(self, running, element, result):
+        if isinstance(result, Exception) or not self.result_is_valid(result):
+            running.counts['failed'] += 1
+        else:
+            running.counts[result['status']] += 1
+
+    def summary(self, running):
+        summary = "%(created)d created, %(updated)d updated, %(unchanged)d unchanged, %(deleted)d deleted, %(failed)d failed" % running.counts
+        if running.dry_run:
+            summary += " (dry run)"
+        return summary
+
+    def format(self, running, name, result):
+        yield "%s %s" % (name, result['status'])
+        for (path, current, wanted) in result.get('differences', []):
+            yield "    %s: %s -> %s" % (path, '-' if current is None else current, '-' if wanted is None else wanted)
+
+
 class DumpVerb(RepeterVerb):
 
     def fill_parser(self, parser):
@@ -159,7 +629,21 @@ class DumpVerb(RepeterVerb):
         return super().check_verb_args(running, pretty=pretty, **kwargs)
 
     async def get(self, running, filter_path=None, **kwargs):
-        return await self.dispatcher.get(running, filter_path=filter_path, **kwargs)
+        return await self.dispatcher.get(running, filter_path=self.attrs_filter_path(running, filter_path), **kwargs)
+
+    def attrs_filter_path(self, running, filter_path):
+        """
+        Only the selected attributes are requested. The default filter_path is kept, so elements without them are
+        still returned
+        """
+        element_filter_path = self.dispatcher.element_filter_path
+        if element_filter_path is None or len(running.attrs) == 0:
+            return filter_path
+        attrs_path = '.'.join((element_filter_path, ) + tuple(running.attrs))
+        if filter_path is None:
+            return attrs_path
+        else:
+            return '%s,%s' % (attrs_path, filter_path)
 
     async def action(self, element, running, *args, only_keys=False, **kwargs):
         curs = element[1]
@@ -172,22 +656,21 @@ class DumpVerb(RepeterVerb):
         else:
             return (element[0], curs)
 
+    def result_is_valid(self, result):
+        # What was read is the result
+        return not isinstance(result, Exception)
+
     def to_str(self, running, result):
         item = result[1]
-        identity = item[0]
-        values = item[1]
         if item is None:
             return None
-        elif len(running.attrs) == 1:
-            if running.attrs[0] in values:
-                content = values[running.attrs[0]]
-            else:
-                content = None
-        elif len(running.attrs) > 0:
-            interested_in = {i: values[i] for i in running.attrs if i in values}
-            content = self.filter_dump(running, interested_in)
-        elif running.only_keys:
-            content = self.filter_dump(identity, list(values))
+        identity = item[0]
+        values = item[1]
+        if running.only_keys and isinstance(values, dict):
+            values = list(values)
+        if len(running.attrs) > 0:
+            # action already walked down the attributes
+            content = values
         else:
             content = self.filter_dump(identity, values)
         return json.dumps(content, **running.formatting)
@@ -215,6 +698,10 @@ class List(RepeterVerb):
         node_info = await self.dispatcher.get(running, **kwargs)
         return node_info
 
+    def result_is_valid(self, result):
+        # What was read is the result
+        return not isinstance(result, Exception)
+
     def to_str(self, running, item):
         name = item[0][0]
         value = item[1]
@@ -293,7 +780,9 @@ class ReadSettings(DumpVerb):
         return super().check_verb_args(running, **kwargs)
 
     async def action(self, element, running, *args, only_keys=False, **kwargs):
-        settings = await self.get_settings(running, element)
+        return self.filter_settings(running, await self.get_settings(running, element))
+
+    def filter_settings(self, running, settings):
         if len(running.settings) > 0:
             new_settings = {}
             for category, values in settings.items():
@@ -1,4 +1,5 @@
 import unittest
+from inspect import isasyncgen
 from eslib import context
 from eslib.pycurlconnection import PyCurlConnection
 from eslib.asynctransport import AsyncTransport
@@ -19,8 +20,14 @@ class TestCaseProvider(unittest.TestCase):
     def _run_action(self, dispatcher, verb, object_options={}, object_args=[]):
         query = dispatcher.run_phrase(verb, object_options, object_args)
         running = dispatcher.api.perform_query(query)
+        if running is not None and isasyncgen(running.result):
+            # Streamed results are collected, so tests can iterate them
+            running.result = iter(dispatcher.api.perform_query(self._collect(running.result)))
         return running
 
+    async def _collect(self, result):
+        return [i async for i in result]
+
     def action_read_settings(self, dispatcher, object_args, tester):
         dispatcher.api = self.ctx
         running = self._run_action(dispatcher, 'readsettings', object_args=object_args)
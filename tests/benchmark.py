@@ -0,0 +1,236 @@
+"""
+Benchmarks of the transport, the verbs and the output formatting of escmd.
+
+Each scenario runs against the stand-in server, or on a synthetic payload, and is timed a few times. The results
+are written as json, so runs on different commits can be compared:
+
+    python -m tests.benchmark -o before.json
+    git checkout ...
+    python -m tests.benchmark -o after.json --compare before.json
+
+The sizes of the scenarios can be reduced with --scale, and some of them selected with -k.
+"""
+
+import asyncio
+import json
+import math
+import optparse
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from io import BytesIO
+from types import SimpleNamespace
+import eslib
+from elasticsearch.serializer import Deserializer, DEFAULT_SERIALIZERS
+from eslib import context
+from eslib.asynctransport import AsyncTransport
+from eslib.escmd import print_run_phrase
+from eslib.pycurlconnection import PyCurlConnection, decode_body
+from eslib.running import Running
+from eslib.tasks import TasksTree
+from eslib.verb import Verb
+from tests.standin import StandIn, SyntheticCluster, Handlers
+
+# The scenarios, by name, with their function and their default size
+scenarios = {}
+
+
+def scenario(name, size):
+    """
+    Register a scenario. Its function is a generator taking a size, it yields the callable to time, and cleans up
+    when closed
+    """
+    def decorator(function):
+        scenarios[name] = (function, size)
+        return function
+    return decorator
+
+
+def connect(standin, maxactive=10):
+    # disconnect closes the loop of the previous context
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    ctx = context.Context(url=standin.url, sniff=False, debug=False, transport_class=AsyncTransport,
+                          connection_class=PyCurlConnection, typehandling='deprecated', maxactive=maxactive)
+    ctx.connect()
+    return ctx
+
+
+@scenario('multi_gets', 10000)
+def multi_gets(size):
+    """Small GET requests, all sent at once through the pycurl multi handle"""
+    with StandIn(indices=1) as standin:
+        ctx = connect(standin)
+
+        async def gets():
+            return await asyncio.gather(*[ctx.escnx.cluster.health() for _ in range(size)])
+        try:
+            yield lambda: ctx.perform_query(gets())
+        finally:
+            ctx.disconnect()
+
+
+@scenario('decode_state', 200)
+def decode_state(size):
+    """Decoding of a cluster state of size MB, as received by the multi handle"""
+    state = SyntheticCluster(nodes=3, indices=100).state()
+    indices = state['metadata']['indices']
+    template = list(indices.values())
+    entry_size = len(json.dumps(template[0]))
+    for i in range(int(size * 1024 * 1024 / entry_size)):
+        indices['index-%08d' % i] = template[i % len(template)]
+    payload = json.dumps(state).encode('utf-8')
+    deserializer = Deserializer(DEFAULT_SERIALIZERS)
+
+    def decode():
+        handle = SimpleNamespace(headers={'content-type': 'application/json; charset=UTF-8'}, buffer=BytesIO(payload))
+        (content_type, body) = decode_body(handle)
+        return deserializer.loads(body, content_type)
+    yield decode
+
+
+@scenario('repeter_fanout', 20000)
+def repeter_fanout(size):
+    """index list over size indices, with its output formatted by escmd"""
+    with StandIn(nodes=3, indices=size) as standin:
+        ctx = connect(standin)
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = ctx
+
+        def run():
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                print_run_phrase(dispatcher, 'list')
+        try:
+            yield run
+        finally:
+            ctx.disconnect()
+
+
+@scenario('nodes_list', 300)
+def nodes_list(size):
+    """node list over size nodes, each response delayed by 10ms"""
+    with StandIn(nodes=size, indices=0, latency=0.01) as standin:
+        ctx = connect(standin)
+        dispatcher = eslib.dispatchers['node']()
+        dispatcher.api = ctx
+
+        def run():
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                print_run_phrase(dispatcher, 'list')
+        try:
+            yield run
+        finally:
+            ctx.disconnect()
+
+
+@scenario('task_tree', 200000)
+def task_tree(size):
+    """Building and rendering the tree of size tasks"""
+    (_, payload) = Handlers(SyntheticCluster(nodes=5, indices=0, tasks=size)).tasks_list({}, None)
+    payload = json.loads(json.dumps(payload))
+    verb = TasksTree(SimpleNamespace(api=None))
+    # Not asyncio.run, it takes the repr of the result, so the whole tree would be rendered once more
+    loop = asyncio.new_event_loop()
+
+    def render():
+        running = Running(verb, object=payload)
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            tree = loop.run_until_complete(verb.execute(running))
+            for line in verb.to_str(running, tree):
+                print(line)
+    try:
+        yield render
+    finally:
+        loop.close()
+
+
+@scenario('flatten', 50000)
+def flatten(size):
+    """Verb.flatten on a mapping of size fields, nested on many levels"""
+    depth = max(1, math.ceil(math.log(size, 4)))
+    mapping = {}
+    for i in range(size):
+        current = mapping
+        for level in range(depth):
+            field = 'f%d' % ((i // 4 ** (depth - level - 1)) % 4)
+            if level == depth - 1:
+                current.setdefault('properties', {})[field] = {'type': 'keyword', 'ignore_above': 256}
+            else:
+                current = current.setdefault('properties', {}).setdefault(field, {})
+    verb = Verb(SimpleNamespace(api=None))
+    yield lambda: verb.flatten(mapping)
+
+
+def run_scenario(name, scale=1.0, repeat=3):
+    (function, size) = scenarios[name]
+    size = max(1, int(size * scale))
+    runner = function(size)
+    try:
+        timed = next(runner)
+        # A first run to warm up the caches and the connections
+        timed()
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            timed()
+            runs.append(round(time.perf_counter() - start, 6))
+    finally:
+        runner.close()
+    return {'size': size, 'runs': runs, 'min': min(runs), 'median': statistics.median(runs)}
+
+
+def run_scenarios(names=None, scale=1.0, repeat=3):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    results = {}
+    for name in scenarios:
+        if names is None or name in names:
+            results[name] = run_scenario(name, scale, repeat)
+    return {'time': round(time.time(), 3), 'commit': commit, 'python': platform.python_version(), 'scale': scale,
+            'repeat': repeat, 'results': results}
+
+
+def compare(previous, current):
+    for (name, result) in current['results'].items():
+        line = '%-16s %10.4fs' % (name, result['median'])
+        before = previous['results'].get(name)
+        if before is not None and before['size'] == result['size']:
+            line += ' %10.4fs %+7.1f%%' % (before['median'], (result['median'] / before['median'] - 1) * 100)
+        yield line
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]\nscenarios are:\n    " + "\n    ".join(scenarios.keys()))
+    parser.add_option("-k", "--scenario", dest="names", default=None, action='append', help="Only run that scenario")
+    parser.add_option("-s", "--scale", dest="scale", default=1.0, type=float, help="The factor applied to the sizes")
+    parser.add_option("-r", "--repeat", dest="repeat", default=3, type=int, help="How many timed runs")
+    parser.add_option("-o", "--output", dest="output", default=None, help="Write the results in that file")
+    parser.add_option("-c", "--compare", dest="compare", default=None, help="The results of a previous run to compare with")
+    (options, args) = parser.parse_args()
+    unknown = [n for n in options.names or [] if n not in scenarios]
+    if len(unknown) > 0:
+        print('unknown scenarios: %s' % ', '.join(unknown), file=sys.stderr)
+        return 253
+    current = run_scenarios(options.names, options.scale, options.repeat)
+    previous = {'results': {}}
+    if options.compare is not None:
+        with open(options.compare, 'r', encoding='utf-8') as previous_file:
+            previous = json.load(previous_file)
+    for line in compare(previous, current):
+        print(line, file=sys.stderr)
+    if options.output is not None:
+        with open(options.output, 'w', encoding='utf-8') as output_file:
+            json.dump(current, output_file, indent=1)
+    else:
+        print(json.dumps(current, indent=1))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
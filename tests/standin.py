@@ -0,0 +1,770 @@
+"""
+A local stand-in for an Elasticsearch cluster.
+
+It serves, over real HTTP, the subset of the Elasticsearch API used by escmd, with a synthetic cluster
+whose size is configurable. Latency, throttling (429), timeouts and oversized responses can be injected,
+so the pycurl transport and the verbs can be exercised and benchmarked without a real cluster.
+
+It can be used from a test:
+
+    with StandIn(nodes=3, indices=100) as standin:
+        ctx = context.Context(url=standin.url, ...)
+
+or started from the command line:
+
+    python -m tests.standin --nodes 3 --indices 1000 --port 9200
+"""
+
+import asyncio
+import fnmatch
+import json
+import optparse
+import random
+import re
+import threading
+import time
+import urllib.parse
+from eslib.offline import filter_path
+
+
+def unflatten(flat):
+    nested = {}
+    for key, value in flat.items():
+        current = nested
+        parts = key.split('.')
+        for part in parts[:-1]:
+            current = current.setdefault(part, {})
+        current[parts[-1]] = value
+    return nested
+
+
+index_defaults = {
+    'index.refresh_interval': '1s',
+    'index.max_result_window': '10000',
+    'index.blocks.read_only_allow_delete': 'false',
+    'index.blocks.write': 'false',
+    'index.mapping.depth.limit': '20',
+    'index.mapping.total_fields.limit': '1000',
+    'index.codec': 'default',
+    'index.translog.durability': 'REQUEST',
+    'index.translog.flush_threshold_size': '512mb',
+    'index.merge.scheduler.max_thread_count': '4',
+    'index.routing.allocation.enable': 'all',
+    'index.search.slowlog.threshold.query.warn': '-1',
+    'index.priority': '1',
+    'index.hidden': 'false',
+}
+
+
+class SyntheticCluster(object):
+    """
+    A fake cluster state, built from a seed, so the same parameters always give the same cluster
+    """
+
+    def __init__(self, nodes=1, indices=10, shards=1, replicas=1, tasks=10, seed=0, prefix='logs-'):
+        self.random = random.Random(seed)
+        self.name = 'standin'
+        self.cluster_uuid = self._uuid()
+        self.nodes = {}
+        for n in range(nodes):
+            self.nodes[self._uuid()] = {
+                'name': 'node-%d' % n,
+                'transport_address': '127.0.0.%d:9300' % (n + 1),
+                'host': '127.0.0.%d' % (n + 1),
+                'ip': '127.0.0.%d' % (n + 1),
+                'version': '7.17.0',
+                'roles': ['data', 'ingest', 'master'],
+            }
+        node_ids = list(self.nodes.keys())
+        self.indices = {}
+        self.templates = {}
+        self.policies = {
+            'logs': {
+                'version': 1,
+                'modified_date': '2026-01-01T00:00:00.000Z',
+                'policy': {'phases': {'hot': {'min_age': '0ms', 'actions': {'rollover': {'max_size': '50gb'}}},
+                                      'delete': {'min_age': '30d', 'actions': {'delete': {}}}}},
+            },
+        }
+        mappings_variants = [
+            {'properties': {'message': {'type': 'text'}, '@timestamp': {'type': 'date'}}},
+            {'properties': {'message': {'type': 'text'}, '@timestamp': {'type': 'date'}, 'host': {'properties': {'name': {'type': 'keyword'}}}}},
+            {'properties': {'message': {'type': 'keyword'}, '@timestamp': {'type': 'date'}}},
+        ]
+        now = int(time.time() * 1000)
+        for i in range(indices):
+            name = '%s%06d' % (prefix, i)
+            settings = {
+                'index.number_of_shards': str(shards),
+                'index.number_of_replicas': str(replicas),
+                'index.uuid': self._uuid(),
+                'index.creation_date': str(now - i * 86400000),
+                'index.provided_name': name,
+                'index.version.created': '7170099',
+                'index.lifecycle.name': 'logs',
+            }
+            if i % 2 == 0:
+                settings['index.refresh_interval'] = '5s'
+            docs = self.random.randint(0, 1000000)
+            routing = {}
+            for s in range(shards):
+                copies = []
+                for r in range(replicas + 1):
+                    copies.append({'state': 'STARTED', 'primary': r == 0, 'node': node_ids[(i + s + r) % len(node_ids)],
+                                   'index': name, 'shard': s, 'relocating_node': None})
+                routing[str(s)] = copies
+            step = ('ERROR' if i % 50 == 7 else 'check-rollover-ready')
+            self.indices[name] = {
+                'aliases': {},
+                'mappings': mappings_variants[i % len(mappings_variants)],
+                'settings': settings,
+                'docs': docs,
+                'segments': self.random.randint(1, 100),
+                'routing': routing,
+                'ilm': {
+                    'index': name, 'managed': True, 'policy': 'logs', 'phase': 'hot', 'action': 'rollover',
+                    'step': step, 'lifecycle_date_millis': now - i * 86400000,
+                    'step_time_millis': now - i * 60000, 'phase_time_millis': now - i * 60000, 'action_time_millis': now - i * 60000,
+                },
+            }
+            if step == 'ERROR':
+                self.indices[name]['ilm']['failed_step'] = 'check-rollover-ready'
+                self.indices[name]['ilm']['step_info'] = {'type': 'illegal_argument_exception', 'reason': 'index.lifecycle.rollover_alias is empty'}
+        self.tasks = {}
+        for t in range(tasks):
+            node_id = node_ids[t % len(node_ids)]
+            task = {
+                'node': node_id, 'id': t + 1, 'type': 'transport', 'action': 'indices:data/write/bulk',
+                'description': 'requests[10], indices[%s000000]' % prefix,
+                'start_time_in_millis': now, 'running_time_in_nanos': 1000000 * t, 'cancellable': False,
+            }
+            if t > 0 and t % 3 != 0:
+                parent = t - (t % 3)
+                task['parent_task_id'] = '%s:%d' % (node_ids[parent % len(node_ids)], parent + 1)
+                task['action'] = 'indices:data/write/bulk[s]'
+            self.tasks['%s:%d' % (node_id, t + 1)] = task
+        self.pending_tasks = 0
+
+    def _uuid(self):
+        return ''.join(self.random.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-') for _ in range(22))
+
+    def resolve_indices(self, expression, ignore_unavailable=False):
+        if expression is None or expression in ('', '_all', '*'):
+            return list(self.indices.keys())
+        names = {}
+        for part in expression.split(','):
+            if part.startswith('-'):
+                names = {n: None for n in names if not fnmatch.fnmatchcase(n, part[1:])}
+            elif '*' in part:
+                names.update({n: None for n in self.indices if fnmatch.fnmatchcase(n, part)})
+            elif part in self.indices:
+                names[part] = None
+            elif not ignore_unavailable:
+                raise NotFound('index_not_found_exception', 'no such index [%s]' % part, part)
+        return list(names)
+
+    def resolve_nodes(self, expression):
+        if expression is None or expression in ('', '_all', '*', '_local', '_master'):
+            return list(self.nodes.keys())
+        ids = []
+        for part in expression.split(','):
+            for node_id, node in self.nodes.items():
+                if (part == node_id or fnmatch.fnmatchcase(node['name'], part)) and node_id not in ids:
+                    ids.append(node_id)
+        return ids
+
+    def index_settings(self, name, flat=False, include_defaults=False):
+        index = self.indices[name]
+        settings = {'settings': dict(index['settings'])}
+        if include_defaults:
+            settings['defaults'] = {k: v for k, v in index_defaults.items() if k not in index['settings']}
+        if not flat:
+            settings = {k: unflatten(v) for k, v in settings.items()}
+        return settings
+
+    def index_stats(self, name, metrics=None):
+        index = self.indices[name]
+        size = index['docs'] * 100
+        primaries = {
+            'docs': {'count': index['docs'], 'deleted': 0},
+            'store': {'size_in_bytes': size, 'size': '%dkb' % (size // 1024)},
+            'indexing': {'index_total': index['docs'], 'index_time_in_millis': index['docs'] // 10},
+            'segments': {'count': index['segments'], 'memory_in_bytes': index['segments'] * 1024},
+        }
+        if metrics is not None:
+            primaries = {k: v for k, v in primaries.items() if k in metrics}
+        return {'uuid': index['settings']['index.uuid'], 'primaries': primaries, 'total': primaries}
+
+    def node_stats(self, node_id):
+        node = self.nodes[node_id]
+        return {
+            'timestamp': int(time.time() * 1000), 'name': node['name'], 'transport_address': node['transport_address'],
+            'host': node['host'], 'ip': node['ip'], 'roles': node['roles'],
+            'indices': {'docs': {'count': 0}, 'store': {'size_in_bytes': 0}},
+            'os': {'cpu': {'percent': 5}, 'mem': {'total_in_bytes': 1 << 34}},
+            'jvm': {'mem': {'heap_used_percent': 42}},
+            'fs': {'total': {'total_in_bytes': 1 << 40, 'free_in_bytes': 1 << 39}},
+            'breakers': {'parent': {'limit_size_in_bytes': 1 << 30, 'estimated_size_in_bytes': 0, 'tripped': 0}},
+        }
+
+    def node_info(self, node_id):
+        info = dict(self.nodes[node_id])
+        info.update({'os': {'name': 'Linux'}, 'http': {'publish_address': info['ip'] + ':9200'}, 'jvm': {'version': '17'},
+                     'settings': {'cluster': {'name': self.name}}})
+        return info
+
+    def health(self):
+        shards = sum(len(i['routing']) for i in self.indices.values())
+        copies = sum(len(c) for i in self.indices.values() for c in i['routing'].values())
+        return {
+            'cluster_name': self.name, 'status': 'green', 'timed_out': False,
+            'number_of_nodes': len(self.nodes), 'number_of_data_nodes': len(self.nodes),
+            'active_primary_shards': shards, 'active_shards': copies, 'relocating_shards': 0,
+            'initializing_shards': 0, 'unassigned_shards': 0, 'number_of_pending_tasks': self.pending_tasks,
+        }
+
+    def state(self):
+        return {
+            'cluster_name': self.name, 'cluster_uuid': self.cluster_uuid, 'version': 1,
+            'master_node': next(iter(self.nodes)),
+            'nodes': {k: {'name': v['name'], 'transport_address': v['transport_address']} for k, v in self.nodes.items()},
+            'metadata': {
+                'cluster_uuid': self.cluster_uuid,
+                'templates': self.templates,
+                'indices': {k: {'state': 'open', 'settings': unflatten(v['settings']), 'mappings': {'_doc': v['mappings']},
+                                'aliases': list(v['aliases'])} for k, v in self.indices.items()},
+            },
+            'routing_table': {'indices': {k: {'shards': v['routing']} for k, v in self.indices.items()}},
+        }
+
+
+class NotFound(Exception):
+    def __init__(self, error_type, reason, resource_id=None):
+        super().__init__(reason)
+        self.error_type = error_type
+        self.reason = reason
+        self.resource_id = resource_id
+
+    def body(self):
+        error = {'type': self.error_type, 'reason': self.reason}
+        if self.resource_id is not None:
+            error['resource.id'] = self.resource_id
+        return {'error': {'root_cause': [error], **error}, 'status': 404}
+
+
+def _true(params, name):
+    return params.get(name, 'false') in ('', 'true')
+
+
+def _split(value):
+    if value is None or value == '':
+        return None
+    return value.split(',')
+
+
+class Handlers(object):
+    """
+    The API implementation, each method take the path arguments, the query parameters and the body,
+    and returns a status and a response
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def root(self, params, body):
+        return 200, {'name': 'node-0', 'cluster_name': self.cluster.name, 'version': {'number': '7.17.0'}, 'tagline': 'You Know, for Search'}
+
+    def cat_indices(self, params, body, index=None):
+        rows = []
+        for name in self.cluster.resolve_indices(index):
+            i = self.cluster.indices[name]
+            rows.append({'health': 'green', 'status': 'open', 'index': name, 'uuid': i['settings']['index.uuid'],
+                         'pri': i['settings']['index.number_of_shards'], 'rep': i['settings']['index.number_of_replicas'],
+                         'docs.count': str(i['docs']), 'docs.deleted': '0', 'store.size': str(i['docs'] * 100)})
+        return 200, self._cat(rows, params)
+
+    def cat_nodes(self, params, body):
+        rows = [{'ip': n['ip'], 'name': n['name'], 'node.role': 'dim', 'master': '*' if i == 0 else '-'} for i, n in enumerate(self.cluster.nodes.values())]
+        return 200, self._cat(rows, params)
+
+    def cat_shards(self, params, body, index=None):
+        rows = []
+        for name in self.cluster.resolve_indices(index):
+            for shard, copies in self.cluster.indices[name]['routing'].items():
+                for c in copies:
+                    rows.append({'index': name, 'shard': shard, 'prirep': 'p' if c['primary'] else 'r', 'state': c['state'],
+                                 'node': self.cluster.nodes[c['node']]['name']})
+        return 200, self._cat(rows, params)
+
+    def _cat(self, rows, params):
+        headers = _split(params.get('h'))
+        if headers is not None:
+            rows = [{k: v for k, v in r.items() if k in headers} for r in rows]
+        if params.get('format') == 'json':
+            return rows
+        return ''.join(' '.join(str(v) for v in r.values()) + '\n' for r in rows)
+
+    def indices_get(self, params, body, index):
+        response = {}
+        for name in self.cluster.resolve_indices(index):
+            i = self.cluster.indices[name]
+            response[name] = {'aliases': i['aliases'], 'mappings': i['mappings'],
+                              'settings': self.cluster.index_settings(name, flat=_true(params, 'flat_settings'))['settings']}
+        return 200, response
+
+    def indices_delete(self, params, body, index):
+        for name in self.cluster.resolve_indices(index, _true(params, 'ignore_unavailable')):
+            del self.cluster.indices[name]
+        return 200, {'acknowledged': True}
+
+    def indices_exists(self, params, body, index):
+        try:
+            self.cluster.resolve_indices(index)
+            return 200, None
+        except NotFound:
+            return 404, None
+
+    def indices_stats(self, params, body, index=None, metric=None):
+        metrics = _split(metric)
+        if metrics is not None and '_all' in metrics:
+            metrics = None
+        indices = {name: self.cluster.index_stats(name, metrics) for name in self.cluster.resolve_indices(index)}
+        primaries = {}
+        for stats in indices.values():
+            for k, v in stats['primaries'].items():
+                primaries[k] = v
+        return 200, {'_shards': {'total': len(indices), 'successful': len(indices), 'failed': 0},
+                     '_all': {'primaries': primaries, 'total': primaries}, 'indices': indices}
+
+    def indices_segments(self, params, body, index=None):
+        indices = {}
+        for name in self.cluster.resolve_indices(index):
+            i = self.cluster.indices[name]
+            segments = {'_%d' % g: {'generation': g, 'num_docs': i['docs'] // i['segments'], 'deleted_docs': 0, 'size_in_bytes': 1024,
+                                    'memory_in_bytes': 512, 'committed': True, 'search': True}
+                        for g in range(i['segments'])}
+            indices[name] = {'shards': {s: [{'routing': {'state': 'STARTED', 'primary': c['primary'], 'node': c['node']},
+                                             'num_committed_segments': i['segments'], 'num_search_segments': i['segments'],
+                                             'segments': segments} for c in copies]
+                                        for s, copies in i['routing'].items()}}
+        return 200, {'_shards': {'total': len(indices), 'successful': len(indices), 'failed': 0}, 'indices': indices}
+
+    def indices_shard_stores(self, params, body, index=None):
+        indices = {}
+        for name in self.cluster.resolve_indices(index):
+            shards = {}
+            for s, copies in self.cluster.indices[name]['routing'].items():
+                shards[s] = {'stores': [{c['node']: {'name': self.cluster.nodes[c['node']]['name']},
+                                         'allocation_id': self.cluster._uuid(), 'allocation': 'primary' if c['primary'] else 'replica'}
+                                        for c in copies]}
+            indices[name] = {'shards': shards}
+        return 200, {'indices': indices}
+
+    def get_settings(self, params, body, index=None):
+        flat = _true(params, 'flat_settings')
+        defaults = _true(params, 'include_defaults')
+        return 200, {name: self.cluster.index_settings(name, flat, defaults) for name in self.cluster.resolve_indices(index)}
+
+    def put_settings(self, params, body, index=None):
+        settings = json.loads(body)
+        flat = {}
+
+        def flatten(prefix, value):
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    flatten(prefix + k + '.', v)
+            else:
+                flat[prefix[:-1]] = value
+        flatten('', settings.get('settings', settings))
+        for name in self.cluster.resolve_indices(index):
+            current = self.cluster.indices[name]['settings']
+            for k, v in flat.items():
+                if not k.startswith('index.'):
+                    k = 'index.' + k
+                if v is None:
+                    current.pop(k, None)
+                else:
+                    current[k] = str(v).lower() if isinstance(v, bool) else str(v)
+        return 200, {'acknowledged': True}
+
+    def get_mapping(self, params, body, index=None):
+        return 200, {name: {'mappings': self.cluster.indices[name]['mappings']} for name in self.cluster.resolve_indices(index)}
+
+    def put_mapping(self, params, body, index=None, doc_type=None):
+        mapping = json.loads(body)
+        for name in self.cluster.resolve_indices(index):
+            current = json.loads(json.dumps(self.cluster.indices[name]['mappings']))
+            current.setdefault('properties', {}).update(mapping.get('properties', {}))
+            self.cluster.indices[name]['mappings'] = current
+        return 200, {'acknowledged': True}
+
+    def ilm_explain(self, params, body, index):
+        indices = {}
+        for name in self.cluster.resolve_indices(index):
+            ilm = self.cluster.indices[name]['ilm']
+            if _true(params, 'only_errors') and ilm['step'] != 'ERROR':
+                continue
+            indices[name] = ilm
+        return 200, {'indices': indices}
+
+    def ilm_retry(self, params, body, index):
+        for name in self.cluster.resolve_indices(index):
+            ilm = self.cluster.indices[name]['ilm']
+            if ilm['step'] != 'ERROR':
+                return 400, {'error': {'type': 'illegal_argument_exception',
+                                       'reason': 'cannot retry an action for an index [%s] that has not encountered an error when running a Lifecycle Policy' % name},
+                             'status': 400}
+        for name in self.cluster.resolve_indices(index):
+            ilm = self.cluster.indices[name]['ilm']
+            ilm['step'] = ilm.pop('failed_step', 'check-rollover-ready')
+            ilm.pop('step_info', None)
+        return 200, {'acknowledged': True}
+
+    def ilm_get(self, params, body, policy=None):
+        if policy is None:
+            return 200, self.cluster.policies
+        response = {}
+        for name in policy.split(','):
+            if name not in self.cluster.policies:
+                raise NotFound('resource_not_found_exception', 'Lifecycle policy not found: %s' % name)
+            response[name] = self.cluster.policies[name]
+        return 200, response
+
+    def ilm_put(self, params, body, policy):
+        previous = self.cluster.policies.get(policy, {'version': 0})
+        self.cluster.policies[policy] = {'version': previous['version'] + 1, 'modified_date': time.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                                         'policy': json.loads(body)['policy']}
+        return 200, {'acknowledged': True}
+
+    def ilm_delete(self, params, body, policy):
+        if policy not in self.cluster.policies:
+            raise NotFound('resource_not_found_exception', 'Lifecycle policy not found: %s' % policy)
+        del self.cluster.policies[policy]
+        return 200, {'acknowledged': True}
+
+    def template_get(self, params, body, name=None):
+        if name is None:
+            return 200, self.cluster.templates
+        response = {k: v for k, v in self.cluster.templates.items() if any(fnmatch.fnmatchcase(k, n) for n in name.split(','))}
+        if len(response) == 0:
+            return 404, {}
+        return 200, response
+
+    def template_put(self, params, body, name):
+        template = json.loads(body)
+        template.setdefault('order', 0)
+        template.setdefault('mappings', {})
+        template.setdefault('aliases', {})
+        settings = {}
+        for k, v in template.get('settings', {}).items():
+            settings[k] = v
+        template['settings'] = settings
+        self.cluster.templates[name] = template
+        return 200, {'acknowledged': True}
+
+    def template_delete(self, params, body, name):
+        if name not in self.cluster.templates:
+            raise NotFound('index_template_missing_exception', 'index_template [%s] missing' % name, name)
+        del self.cluster.templates[name]
+        return 200, {'acknowledged': True}
+
+    def nodes_info(self, params, body, node_id=None, metric=None):
+        if metric is None and node_id is not None and node_id not in ('_all', '_local') and len(self.cluster.resolve_nodes(node_id)) == 0:
+            # /_nodes/{metric} form
+            node_id, metric = None, node_id
+        ids = self.cluster.resolve_nodes(node_id)
+        return 200, {'_nodes': {'total': len(ids), 'successful': len(ids), 'failed': 0}, 'cluster_name': self.cluster.name,
+                     'nodes': {i: self.cluster.node_info(i) for i in ids}}
+
+    def nodes_stats(self, params, body, node_id=None, metric=None):
+        ids = self.cluster.resolve_nodes(node_id)
+        metrics = _split(metric)
+        nodes = {}
+        for i in ids:
+            stats = self.cluster.node_stats(i)
+            if metrics is not None and '_all' not in metrics:
+                known = set(['breaker', 'fs', 'jvm', 'os', 'indices'])
+                for m in metrics:
+                    if m not in known:
+                        return 400, {'error': {'type': 'illegal_argument_exception',
+                                               'reason': 'request [/_nodes/%s/stats/%s] contains unrecognized metric: [%s]' % (node_id, metric, m)},
+                                     'status': 400}
+                stats = {k: v for k, v in stats.items() if k in ('timestamp', 'name', 'transport_address', 'host', 'ip', 'roles')
+                         or k in metrics or (k == 'breakers' and 'breaker' in metrics)}
+            nodes[i] = stats
+        return 200, {'_nodes': {'total': len(ids), 'successful': len(ids), 'failed': 0}, 'cluster_name': self.cluster.name, 'nodes': nodes}
+
+    def cluster_health(self, params, body, index=None):
+        return 200, self.cluster.health()
+
+    def cluster_state(self, params, body, metric=None, index=None):
+        state = self.cluster.state()
+        if metric is not None and metric != '_all':
+            metrics = set(metric.split(','))
+            state = {k: v for k, v in state.items() if k in ('cluster_name', 'cluster_uuid') or k in metrics}
+        return 200, state
+
+    def cluster_settings(self, params, body):
+        response = {'persistent': {}, 'transient': {}}
+        if _true(params, 'include_defaults'):
+            response['defaults'] = {'cluster.name': self.cluster.name, 'cluster.routing.allocation.enable': 'all'}
+        if not _true(params, 'flat_settings'):
+            response = {k: unflatten(v) for k, v in response.items()}
+        return 200, response
+
+    def cluster_put_settings(self, params, body):
+        return 200, dict(json.loads(body), acknowledged=True)
+
+    def pending_tasks(self, params, body):
+        return 200, {'tasks': [{'insert_order': i, 'priority': 'URGENT', 'source': 'put-mapping', 'time_in_queue_millis': 10}
+                               for i in range(self.cluster.pending_tasks)]}
+
+    def tasks_list(self, params, body):
+        nodes = {}
+        for key, task in self.cluster.tasks.items():
+            node = self.cluster.nodes[task['node']]
+            node_entry = nodes.setdefault(task['node'], {'name': node['name'], 'transport_address': node['transport_address'],
+                                                         'host': node['host'], 'ip': node['ip'], 'roles': node['roles'], 'tasks': {}})
+            node_entry['tasks'][key] = task
+        if params.get('group_by', 'nodes') == 'nodes':
+            return 200, {'nodes': nodes}
+        return 200, {'tasks': self.cluster.tasks}
+
+    def bulk(self, params, body, index=None):
+        lines = [l for l in body.split('\n') if l.strip() != '']
+        items = []
+        for action in lines[::2]:
+            op, meta = next(iter(json.loads(action).items()))
+            items.append({op: {'_index': meta.get('_index', index), '_id': meta.get('_id', str(len(items))), 'status': 201, 'result': 'created'}})
+        return 200, {'took': 1, 'errors': False, 'items': items}
+
+    def search(self, params, body, index=None):
+        size = int(params.get('size', 10))
+        query = json.loads(body) if body else {}
+        size = query.get('size', size)
+        names = self.cluster.resolve_indices(index)
+        total = sum(self.cluster.indices[n]['docs'] for n in names)
+        hits = [{'_index': names[i % len(names)], '_id': str(i), '_score': 1.0, '_source': {'message': 'document %d' % i}}
+                for i in range(min(size, total))] if len(names) > 0 else []
+        response = {'took': 1, 'timed_out': False, '_shards': {'total': len(names), 'successful': len(names), 'failed': 0},
+                    'hits': {'total': {'value': total, 'relation': 'eq'}, 'max_score': 1.0, 'hits': hits}}
+        if 'scroll' in params:
+            response['_scroll_id'] = 'standin-0'
+        return 200, response
+
+    def scroll(self, params, body):
+        return 200, {'_scroll_id': 'standin-0', 'took': 1, 'timed_out': False, 'hits': {'total': {'value': 0, 'relation': 'eq'}, 'hits': []}}
+
+
+_index = r'(?P<index>_all|[^_/][^/]*)'
+routes = [
+    ('HEAD', r'/', 'root'),
+    ('GET', r'/', 'root'),
+    ('GET', r'/_cat/indices(?:/%s)?' % _index, 'cat_indices'),
+    ('GET', r'/_cat/nodes', 'cat_nodes'),
+    ('GET', r'/_cat/shards(?:/%s)?' % _index, 'cat_shards'),
+    ('GET', r'/_cluster/health(?:/%s)?' % _index, 'cluster_health'),
+    ('GET', r'/_cluster/state(?:/(?P<metric>[^/]+))?(?:/%s)?' % _index, 'cluster_state'),
+    ('GET', r'/_cluster/settings', 'cluster_settings'),
+    ('PUT', r'/_cluster/settings', 'cluster_put_settings'),
+    ('GET', r'/_cluster/pending_tasks', 'pending_tasks'),
+    ('GET', r'/_tasks', 'tasks_list'),
+    ('GET', r'/_nodes(?:/(?P<node_id>[^/_][^/]*|_all|_local))?/stats(?:/(?P<metric>[^/]+))?', 'nodes_stats'),
+    ('GET', r'/_nodes(?:/(?P<node_id>[^/]+))?(?:/(?P<metric>[^/]+))?', 'nodes_info'),
+    ('GET', r'/_template(?:/(?P<name>[^/]+))?', 'template_get'),
+    ('PUT', r'/_template/(?P<name>[^/]+)', 'template_put'),
+    ('DELETE', r'/_template/(?P<name>[^/]+)', 'template_delete'),
+    ('GET', r'/_ilm/policy(?:/(?P<policy>[^/]+))?', 'ilm_get'),
+    ('PUT', r'/_ilm/policy/(?P<policy>[^/]+)', 'ilm_put'),
+    ('DELETE', r'/_ilm/policy/(?P<policy>[^/]+)', 'ilm_delete'),
+    ('POST', r'/(?:%s/)?_bulk' % _index, 'bulk'),
+    ('PUT', r'/(?:%s/)?_bulk' % _index, 'bulk'),
+    ('GET', r'/_search/scroll', 'scroll'),
+    ('POST', r'/_search/scroll', 'scroll'),
+    ('GET', r'/(?:%s/)?_search' % _index, 'search'),
+    ('POST', r'/(?:%s/)?_search' % _index, 'search'),
+    ('GET', r'/(?:%s/)?_stats(?:/(?P<metric>[^/]+))?' % _index, 'indices_stats'),
+    ('GET', r'/(?:%s/)?_segments' % _index, 'indices_segments'),
+    ('GET', r'/(?:%s/)?_shard_stores' % _index, 'indices_shard_stores'),
+    ('GET', r'/(?:%s/)?_settings' % _index, 'get_settings'),
+    ('PUT', r'/(?:%s/)?_settings' % _index, 'put_settings'),
+    ('GET', r'/(?:%s/)?_mapping' % _index, 'get_mapping'),
+    ('PUT', r'/%s/_mapping(?:/(?P<doc_type>[^/]+))?' % _index, 'put_mapping'),
+    ('GET', r'/%s/_ilm/explain' % _index, 'ilm_explain'),
+    ('POST', r'/%s/_ilm/retry' % _index, 'ilm_retry'),
+    ('HEAD', r'/%s' % _index, 'indices_exists'),
+    ('GET', r'/%s' % _index, 'indices_get'),
+    ('DELETE', r'/%s' % _index, 'indices_delete'),
+]
+routes = [(m, re.compile(p), h) for (m, p, h) in routes]
+
+
+class StandIn(object):
+    """
+    The HTTP server, it runs its own event loop in a thread, so it can be used with the synchronous escmd API.
+
+    :arg latency: seconds added to each response
+    :arg throttle_rate: the probability for a request to be rejected with a 429
+    :arg timeout_rate: the probability for a request to never be answered
+    :arg oversize: the count of bytes added to each json response
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, throttle_rate=0.0, timeout_rate=0.0, oversize=0, seed=0, **cluster_args):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.timeout_rate = timeout_rate
+        self.oversize = oversize
+        self.random = random.Random(seed)
+        self.cluster = SyntheticCluster(seed=seed, **cluster_args)
+        self.handlers = Handlers(self.cluster)
+        self.requests = {}
+        self.sent_bytes = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % (self.host, self.port)
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def dispatch(self, method, path, params, body):
+        for (route_method, route_re, handler_name) in routes:
+            if route_method != method:
+                continue
+            matcher = route_re.fullmatch(path)
+            if matcher is not None:
+                self.requests[handler_name] = self.requests.get(handler_name, 0) + 1
+                args = {k: urllib.parse.unquote(v) for k, v in matcher.groupdict().items() if v is not None}
+                try:
+                    status, data = getattr(self.handlers, handler_name)(params, body, **args)
+                except NotFound as e:
+                    status, data = 404, e.body()
+                if isinstance(data, (dict, list)):
+                    data = filter_path(data, params.get('filter_path'))
+                return status, data
+        return 400, {'error': {'type': 'illegal_argument_exception', 'reason': 'no handler found for uri [%s] and method [%s]' % (path, method)},
+                     'status': 400}
+
+    async def _answer(self, writer, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query, keep_blank_values=True).items()}
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self.timeout_rate > 0 and self.random.random() < self.timeout_rate:
+            # Never answer, the client will time out
+            await asyncio.sleep(3600)
+        if self.throttle_rate > 0 and self.random.random() < self.throttle_rate:
+            status, data = 429, {'error': {'type': 'es_rejected_execution_exception', 'reason': 'rejected execution'}, 'status': 429}
+        else:
+            status, data = self.dispatch(method, url.path.rstrip('/') or '/', params, body)
+        if isinstance(data, (dict, list)):
+            if self.oversize > 0 and isinstance(data, dict):
+                data = dict(data, _padding='x' * self.oversize)
+            payload = json.dumps(data).encode('utf-8')
+            content_type = 'application/json; charset=UTF-8'
+        elif data is None:
+            payload = b''
+            content_type = 'application/json; charset=UTF-8'
+        else:
+            payload = str(data).encode('utf-8')
+            content_type = 'text/plain; charset=UTF-8'
+        headers = ['HTTP/1.1 %d %s' % (status, 'OK' if status < 400 else 'Error'),
+                   'content-type: %s' % content_type,
+                   'content-length: %d' % len(payload)]
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('iso-8859-1'))
+        if method != 'HEAD':
+            writer.write(payload)
+            self.sent_bytes += len(payload)
+        await writer.drain()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('iso-8859-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode('iso-8859-1').strip()
+                    if line == '':
+                        break
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = (await reader.readexactly(length)).decode('utf-8') if length > 0 else None
+                await self._answer(writer, method, target, body)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def start(self):
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name='standin', daemon=True)
+        self.thread.start()
+        started.wait()
+        return self
+
+    async def _shutdown(self):
+        self.server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("-H", "--host", dest="host", default='127.0.0.1')
+    parser.add_option("-p", "--port", dest="port", default=9200, type=int)
+    parser.add_option("-N", "--nodes", dest="nodes", default=3, type=int)
+    parser.add_option("-M", "--indices", dest="indices", default=100, type=int)
+    parser.add_option("-S", "--shards", dest="shards", default=1, type=int)
+    parser.add_option("-T", "--tasks", dest="tasks", default=100, type=int)
+    parser.add_option("-l", "--latency", dest="latency", default=0.0, type=float)
+    parser.add_option("--throttle_rate", dest="throttle_rate", default=0.0, type=float)
+    parser.add_option("--timeout_rate", dest="timeout_rate", default=0.0, type=float)
+    parser.add_option("--oversize", dest="oversize", default=0, type=int)
+    (options, args) = parser.parse_args()
+    standin = StandIn(**vars(options))
+    standin.start()
+    print("Listening on %s" % standin.url)
+    try:
+        standin.thread.join()
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+import unittest
+from tests.benchmark import scenarios, run_scenarios, compare
+
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    def test_run(self):
+        results = run_scenarios(scale=0.001, repeat=1)
+        self.assertEqual(list(scenarios.keys()), list(results['results'].keys()))
+        for result in results['results'].values():
+            self.assertEqual(1, len(result['runs']))
+        previous = {'results': {'flatten': dict(results['results']['flatten'], median=results['results']['flatten']['median'] * 2)}}
+        lines = list(compare(previous, results))
+        self.assertEqual(len(scenarios), len(lines))
+        self.assertTrue([l for l in lines if l.startswith('flatten')][0].endswith('-50.0%'))
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from elasticsearch.exceptions import NotFoundError
+from eslib.cassette import request_key, Cassette, ReplayConnection
+from eslib.offline import LocalHandler
+
+
+class CassetteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.json.gz')
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def test_request_key(self):
+        self.assertEqual(request_key('GET', '/_nodes', {'level': b'node', 'human': 'true'}), 'GET /_nodes?human=true&level=node')
+        self.assertEqual(request_key('POST', '/_bulk', None, '{}'), 'POST /_bulk bf21a9e8fbc5')
+
+    def test_replay(self):
+        cassette = Cassette(self.file_name)
+        cassette.record('GET /_cluster/pending_tasks', [200, 'application/json', '{"tasks":[1]}'])
+        cassette.record('GET /_cluster/pending_tasks', [200, 'application/json', '{"tasks":[]}'])
+        cassette.record('GET /a', [200, 'application/json', '{"tasks":[]}'])
+        cassette.record('GET /b', [404, None, [404, 'index_not_found_exception', {}]])
+        cassette.save()
+        cassette = Cassette(self.file_name, load=True)
+        self.assertEqual(len(cassette.responses), 3)
+
+        async def replay():
+            connection = ReplayConnection(cassette=cassette, multi_handle=LocalHandler(), latency=0.05, bandwidth=1000)
+            results = []
+            for path in ('/_cluster/pending_tasks', '/_cluster/pending_tasks', '/_cluster/pending_tasks', '/b'):
+                future = asyncio.get_running_loop().create_future()
+                await connection.perform_request('GET', path, future=future)
+                results.append(future.exception() if future.exception() is not None else future.result()[2])
+            return results, connection.multi_handle
+
+        start = time.monotonic()
+        (results, handler) = asyncio.run(replay())
+        self.assertGreater(time.monotonic() - start, 0.2)
+        self.assertEqual(results[0:3], ['{"tasks":[1]}', '{"tasks":[]}', '{"tasks":[]}'])
+        self.assertIsInstance(results[3], NotFoundError)
+        self.assertEqual(handler.requests, 4)
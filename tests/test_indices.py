@@ -1,3 +1,5 @@
+import os
+import tempfile
 import eslib
 import json
 import tests
@@ -22,6 +24,17 @@ class IndicesTestCase(tests.TestCaseProvider):
             self.assertIsInstance(i, str)
             self.assertIsInstance(data, dict)
 
+    def test_dump_attributes(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        running = self._run_action(dispatcher, 'dump', object_options={'index_name': id(self)}, object_args=['settings', 'index', 'number_of_shards'])
+        self.assertEqual(1, len(running.object))
+        for i, data in running.object.items():
+            self.assertEqual(['settings'], list(data.keys()))
+            self.assertNotIn('mappings', data)
+        for j in running.result:
+            self.assertEqual('"1"', running.cmd.to_str(running, j))
+
     def test_dump_missing(self):
         dispatcher = eslib.dispatchers['index']()
         dispatcher.api = self.ctx
@@ -92,7 +105,16 @@ class IndicesTestCase(tests.TestCaseProvider):
             expected = "%s set" % id(self)
             self.assertEqual(expected, running.cmd.to_str(running, j))
         for j in running.result:
-            tester(running, j)
+            if isinstance(j, str):
+                self.assertEqual('1 changed, 0 unchanged, 0 failed', j)
+            else:
+                tester(running, j)
+        # Already set, nothing is written
+        running = self._run_action(dispatcher, 'writesettings', object_options={'index_name': '%s' % id(self)},
+                                   object_args=['refresh_interval=5s', 'blocks.read_only_allow_delete=null', 'mapping.depth.limit=2'])
+        results = list(running.result)
+        self.assertEqual(['%s unchanged' % id(self), '0 changed, 1 unchanged, 0 failed'],
+                         [j if isinstance(j, str) else running.cmd.to_str(running, j) for j in results])
 
         running = self._run_action(dispatcher, 'readsettings', object_options={'index_name': '%s' % id(self)},
                                    object_args=['refresh_interval', 'blocks.read_only_allow_delete', 'mapping.depth.limit'])
@@ -141,3 +163,59 @@ class IndicesTestCase(tests.TestCaseProvider):
             s_all= i[1]['_all']['primaries']
             self.assertEqual(len(s_all), 1)
             self.assertTrue('indexing' in s_all)
+
+    def test_stats_batched(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        names = ['%s' % id(self), '%s-2' % id(self)]
+        self.ctx.perform_query(self.ctx.escnx.indices.create(names[1]))
+        try:
+            running = self._run_action(dispatcher, 'stats', object_options={'index_name': '%s*' % id(self)}, object_args=['-m', 'docs'])
+            results = list(running.result)
+            self.assertEqual(2, len(results))
+            for (element, stats) in results:
+                self.assertIn(element[0], names)
+                self.assertEqual([element[0]], list(stats['indices'].keys()))
+                self.assertIn('docs', stats['_all']['primaries'])
+        finally:
+            self.ctx.perform_query(self.ctx.escnx.indices.delete(names[1]))
+
+    def test_update_mapping(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        fd, mapping_file_name = tempfile.mkstemp(suffix='.yaml')
+        with os.fdopen(fd, 'w') as mapping_file:
+            mapping_file.write('mappings:\n  properties:\n    added:\n      type: keyword\n      ignore_above: 256\n')
+        try:
+            for expected in ('%s mapping updated' % id(self), '%s mapping unchanged' % id(self)):
+                running = self._run_action(dispatcher, 'updatemapping', object_options={'index_name': '%s' % id(self)},
+                                           object_args=['-m', mapping_file_name])
+                results = [j for j in running.result if not isinstance(j, str)]
+                self.assertEqual([expected], [running.cmd.to_str(running, j) for j in results])
+        finally:
+            os.unlink(mapping_file_name)
+
+    def test_delete_chunked(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        names = ['%s-2' % id(self), '%s-3' % id(self)]
+        for name in names:
+            self.ctx.perform_query(self.ctx.escnx.indices.create(name))
+        running = self._run_action(dispatcher, 'delete', object_options={'index_name': '%s-*' % id(self)}, object_args=['-c'])
+        results = list(running.result)
+        self.assertEqual(sorted(['%s deleted' % name for name in names]), sorted([running.cmd.to_str(running, j) for j in results]))
+        self.assertFalse(self.ctx.perform_query(self.ctx.escnx.indices.exists('%s-*' % id(self))))
+
+    def test_diff(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        other = '%s-2' % id(self)
+        self.ctx.perform_query(self.ctx.escnx.indices.create(other, body={'settings': {'index.refresh_interval': '7s'}}))
+        try:
+            running = self._run_action(dispatcher, 'diff', object_options={'index_name': '%s*' % id(self)}, object_args=['-s'])
+            clusters = list(running.result)
+            self.assertEqual(2, len(clusters))
+            self.assertEqual([], clusters[0][1])
+            self.assertEqual([('settings.index.refresh_interval', None, '7s')], clusters[1][1])
+        finally:
+            self.ctx.perform_query(self.ctx.escnx.indices.delete(other))
@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from eslib.journal import Journal
+from eslib.exceptions import ESLibError
+from eslib.verb import RepeterVerb
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def test_resume(self):
+        journal = Journal(self.file_name)
+        journal.record('index', 'delete', (), 'a')
+        journal.record('index', 'delete', (), 'b', 'x' * 1000)
+        journal.close()
+        with open(self.file_name, 'r') as journal_file:
+            entries = [json.loads(line) for line in journal_file]
+        self.assertNotIn('result', entries[0])
+        self.assertEqual(Journal.max_error_length, len(entries[1]['error']))
+        with open(self.file_name, 'a') as journal_file:
+            journal_file.write('{"time":1,"noun":"index","verb":"delete","args":[],"element":"c"}\n[]\n')
+            journal_file.write('{"time":1,"noun":"index"')
+
+        journal = Journal(self.file_name)
+        self.assertTrue(journal.is_done('index', 'delete', (), 'a'))
+        self.assertFalse(journal.is_done('index', 'delete', (), 'b'))
+        self.assertFalse(journal.is_done('index', 'delete', (), 'c'))
+        self.assertFalse(journal.is_done('index', 'delete', ('-f', ), 'a'))
+        self.assertFalse(journal.is_done('index', 'writesettings', (), 'a'))
+        journal.record('index', 'delete', (), 'b')
+        journal.close()
+        self.assertTrue(Journal(self.file_name).is_done('index', 'delete', (), 'b'))
+
+    def test_error(self):
+        verb = RepeterVerb(SimpleNamespace(api=None))
+        self.assertIsNone(verb._journal_error({'acknowledged': True}))
+        self.assertEqual('{"acknowledged": false}', verb._journal_error({'acknowledged': False}))
+        self.assertEqual('failed', verb._journal_error(ESLibError('failed')))
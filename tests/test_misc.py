@@ -1,7 +1,7 @@
 import optparse
 import eslib
 import tests
-from eslib.escmd import get_parser
+from eslib.escmd import get_parser, split_pipeline
 from eslib.context import Context
 
 
@@ -72,6 +72,9 @@ class MiscTestCase(tests.TestCaseProvider):
             running = self._run_action(dispatcher, 'tree')
             for i in running.object:
                 pass
+            for line in running.cmd.to_str(running, running.result):
+                self.assertIsInstance(line, str)
+                self.assertNotIn('\n', line)
 
 
     def test_default_parser_args(self):
@@ -98,3 +101,31 @@ class MiscTestCase(tests.TestCaseProvider):
     def test_empty_context(self):
         ctx = Context()
         self.assertTrue(ctx.connect())
+
+    def test_split_pipeline(self):
+        phrases = split_pipeline(['segments', '--where', 'count>50', '|', 'forcemerge', '-m', '1', '--where=_shards.failed=0'])
+        self.assertEqual([('segments', [], 'count>50'), ('forcemerge', ['-m', '1'], '_shards.failed=0')], phrases)
+        self.assertEqual([('list', ['-m'], None)], split_pipeline(['list', '-m']))
+
+    def test_where(self):
+        check = eslib.parse_where('count>50,phase=hot')
+        self.assertTrue(check({'count': 51, 'phase': 'hot'}))
+        self.assertFalse(check({'count': '50', 'phase': 'hot'}))
+        self.assertFalse(check({'count': 51}))
+
+    def test_pipeline(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        phrases = [('list', [], 'indices.%s.primaries.docs.count>=0' % id(self)), ('ilm', [], None)]
+        running = dispatcher.api.perform_query(dispatcher.run_pipeline(phrases, {'index_name': '%s' % id(self)}))
+        results = dispatcher.api.perform_query(self._collect(running.result))
+        self.assertEqual(1, len(results))
+        self.assertEqual('%s' % id(self), results[0][0][0])
+
+    def test_ilm_report(self):
+        dispatcher = eslib.dispatchers['ilm']()
+        dispatcher.api = self.ctx
+        running = self._run_action(dispatcher, 'report', object_args=['-p', '%s' % id(self)])
+        # The test index is not managed
+        self.assertEqual({}, running.result['steps'])
+        self.assertEqual([], running.result['failed'])
@@ -0,0 +1,50 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from elasticsearch.exceptions import NotFoundError
+from eslib.exceptions import ESLibError
+from eslib.offline import filter_path, Bundle
+
+
+class OfflineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.json.gz')
+        os.close(fd)
+        responses = [
+            ['GET', '/', {}, {'version': {'number': '7.17.0'}}],
+            ['GET', '/_all', {}, {'a1': {'settings': {'index': {'uuid': 'u1'}}, 'mappings': {}},
+                                  'a2': {'settings': {'index': {'uuid': 'u2'}}, 'mappings': {}},
+                                  'b1': {'settings': {'index': {'uuid': 'u3'}}, 'mappings': {}}}],
+            ['GET', '/_all/_stats', {'human': 'true'}, {'_all': {}, 'indices': {'a1': {'uuid': 'u1'}, 'b1': {'uuid': 'u3'}}}],
+            ['GET', '/_nodes/stats', {'level': 'node'}, {'nodes': {'id1': {'name': 'n1'}, 'id2': {'name': 'n2'}}}],
+        ]
+        with gzip.open(self.file_name, 'wt', encoding='utf-8') as bundle_file:
+            json.dump({'captured': 0, 'url': None, 'responses': responses}, bundle_file)
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def test_filter_path(self):
+        data = {'nodes': {'id1': {'name': 'n1', 'ip': 'i1'}}, 'rows': [{'a': 1, 'b': 2}, {'b': 3}]}
+        self.assertEqual(filter_path(data, 'nodes.*.name'), {'nodes': {'id1': {'name': 'n1'}}})
+        self.assertEqual(filter_path(data, 'rows.a'), {'rows': [{'a': 1}]})
+        self.assertEqual(filter_path(data, '**.ip'), {'nodes': {'id1': {'ip': 'i1'}}})
+        self.assertEqual(filter_path(data, 'none'), {})
+        self.assertIs(filter_path(data, None), data)
+
+    def test_lookup(self):
+        bundle = Bundle(self.file_name)
+        self.assertEqual(bundle.lookup('HEAD', '/', {}), {'version': {'number': '7.17.0'}})
+        self.assertEqual(list(bundle.lookup('GET', '/a*,-a2', {})), ['a1'])
+        self.assertEqual(bundle.lookup('GET', '/a1/_settings', {}), {'a1': {'settings': {'index': {'uuid': 'u1'}}}})
+        self.assertEqual(bundle.lookup('GET', '/*/_stats', {'filter_path': 'indices.*.uuid'}),
+                         {'indices': {'a1': {'uuid': 'u1'}, 'b1': {'uuid': 'u3'}}})
+        self.assertEqual(bundle.lookup('GET', '/b1/_stats', {}), {'_all': {}, 'indices': {'b1': {'uuid': 'u3'}}})
+        self.assertEqual(bundle.lookup('GET', '/_nodes/n2/stats', {'level': b'node'}), {'nodes': {'id2': {'name': 'n2'}}})
+        self.assertRaises(NotFoundError, bundle.lookup, 'GET', '/a3', {})
+        # The level of the captured response is not the requested one
+        self.assertRaises(ESLibError, bundle.lookup, 'GET', '/_nodes/stats', {'level': 'indices'})
+        self.assertRaises(ESLibError, bundle.lookup, 'GET', '/_cluster/health', {})
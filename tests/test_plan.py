@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+from eslib.plan import endpoint, History, Plan
+
+
+class PlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.file_name)
+
+    def test_endpoint(self):
+        self.assertEqual(endpoint('/a,b,c/_settings?include_defaults=true'), ('/{}/_settings', 3))
+        self.assertEqual(endpoint('/_nodes/n1/stats'), ('/_nodes/{}/stats', 1))
+        self.assertEqual(endpoint('/_cluster/health'), ('/_cluster/health', 0))
+        self.assertEqual(endpoint('/'), ('/', 0))
+
+    def test_estimate(self):
+        history = History(self.file_name)
+        history.record('GET', '/a,b/_settings', 200)
+        history.record('GET', '/_cluster/health', 50)
+        history.save()
+
+        plan = Plan(History(self.file_name))
+        plan.record('GET', '/c,d,e/_settings')
+        plan.record('GET', '/f/_settings')
+        plan.record('PUT', '/c/_settings')
+        plan.in_flight = 4
+        self.assertEqual(list(plan.lines()), ['sent: 0 requests to find the elements',
+                                              'planned: GET /{}/_settings 2 requests for 4 names, ~400 bytes',
+                                              'planned: PUT /{}/_settings 1 requests for 1 names',
+                                              'in flight: 4',
+                                              'estimated size: ~400 bytes'])
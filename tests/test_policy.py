@@ -0,0 +1,46 @@
+import eslib
+import tests
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from yaml import safe_load
+from eslib.policies import PoliciesSync
+
+
+class PolicyTestCase(tests.TestCaseProvider):
+
+    def test_sync(self):
+        dispatcher = eslib.dispatchers['policy']()
+        dispatcher.api = self.ctx
+        name = 'sync-%s' % id(self)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, name + '.yaml'), 'w') as policy_file:
+                policy_file.write('policy:\n  phases:\n    delete:\n      min_age: 30d\n      actions:\n        delete: {}\n')
+            try:
+                for expected in ('created', 'unchanged'):
+                    running = self._run_action(dispatcher, 'sync', object_args=['-d', directory])
+                    results = [j for j in running.result if not isinstance(j, str) and j[0][0] == name]
+                    self.assertEqual([expected], [j[1]['status'] for j in results])
+                with open(os.path.join(directory, name + '.yaml'), 'a') as policy_file:
+                    policy_file.write('    warm:\n      min_age: 7d\n      actions: {}\n')
+                running = self._run_action(dispatcher, 'sync', object_args=['-d', directory, '--dry_run'])
+                results = [j for j in running.result if not isinstance(j, str) and j[0][0] == name]
+                self.assertEqual('updated', results[0][1]['status'])
+                self.assertEqual([('phases.warm.min_age', None, '7d')], results[0][1]['differences'])
+            finally:
+                self._run_action(dispatcher, 'delete', object_options={'policy_name': name})
+
+
+class PolicyCanonicalTestCase(unittest.TestCase):
+
+    def test_defaults(self):
+        verb = PoliciesSync(SimpleNamespace(api=None))
+        wanted = safe_load('phases:\n  delete:\n    min_age: 30d\n    actions:\n      delete: {}\n'
+                           '  warm:\n    actions:\n      allocate:\n        number_of_replicas: 1\n')
+        current = {'version': 2, 'modified_date': '2024-01-01T00:00:00.000Z', 'policy': {'phases': {
+            'delete': {'min_age': '30d', 'actions': {'delete': {'delete_searchable_snapshot': True}}},
+            'warm': {'min_age': '0ms', 'actions': {'allocate': {'number_of_replicas': 1, 'include': {}, 'exclude': {}, 'require': {}}}}}}}
+        self.assertEqual(verb.canonical(None, current), verb.canonical(None, wanted))
+        current['policy']['phases']['delete']['actions']['delete']['delete_searchable_snapshot'] = False
+        self.assertNotEqual(verb.canonical(None, current), verb.canonical(None, wanted))
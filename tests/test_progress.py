@@ -0,0 +1,41 @@
+import io
+import json
+import unittest
+from contextlib import redirect_stderr
+from eslib.progress import Progress
+
+
+class Counters(object):
+    requests = 0
+    sent_bytes = 0
+    received_bytes = 0
+
+
+class ProgressTestCase(unittest.TestCase):
+
+    def test_status(self):
+        counters = Counters()
+        stream = io.StringIO()
+        progress = Progress(counters, total=10, stream=stream)
+        self.assertIsNone(progress.eta())
+        progress.skip(2)
+        progress.started(4)
+        progress.finished(1.0, count=2, failed=1)
+        counters.requests = 1
+        counters.received_bytes = 100
+        self.assertEqual(progress.eta(), 3.0)
+        progress.report()
+        status = json.loads(stream.getvalue())['progress']
+        self.assertEqual(status['completed'], 1)
+        self.assertEqual(status['failed'], 1)
+        self.assertEqual(status['skipped'], 2)
+        self.assertEqual(status['in_flight'], 2)
+        self.assertEqual(status['total'], 10)
+        self.assertGreater(status['requests_per_s'], 0)
+
+    def test_redirected(self):
+        stream = io.StringIO()
+        with redirect_stderr(stream):
+            progress = Progress(Counters(), total=1)
+            progress.report()
+        self.assertIn('progress', json.loads(stream.getvalue()))
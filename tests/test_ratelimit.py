@@ -0,0 +1,50 @@
+import asyncio
+import time
+import unittest
+from eslib.ratelimit import endpoint_class, RateLimitTransport
+
+
+class FakeTransport(object):
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.requests = []
+
+    async def perform_request(self, method, url, headers=None, params=None, body=None):
+        self.requests.append((method, url))
+        if url == '/_cluster/pending_tasks':
+            return {'tasks': [{'insert_order': i} for i in range(self.pending.pop(0) if len(self.pending) > 0 else 0)]}
+        return {'acknowledged': True}
+
+
+class RateLimitTestCase(unittest.TestCase):
+
+    def test_endpoint_class(self):
+        self.assertEqual(endpoint_class('PUT', '/a,b/_settings'), 'settings')
+        self.assertEqual(endpoint_class('PUT', '/_cluster/settings'), 'settings')
+        self.assertEqual(endpoint_class('POST', '/_cluster/reroute'), 'reroute')
+        self.assertEqual(endpoint_class('PUT', '/a/_mapping/_doc'), 'mapping')
+        self.assertEqual(endpoint_class('DELETE', '/_template/t'), 'template')
+        self.assertEqual(endpoint_class('DELETE', '/a'), 'delete')
+        self.assertIsNone(endpoint_class('GET', '/a/_settings'))
+        self.assertIsNone(endpoint_class('POST', '/a/_search'))
+        # Indices named like API words
+        self.assertEqual(endpoint_class('PUT', '/settings/_mapping'), 'mapping')
+        self.assertEqual(endpoint_class('DELETE', '/settings'), 'delete')
+        self.assertEqual(endpoint_class('PUT', '/mapping,stats/_settings'), 'settings')
+        self.assertIsNone(endpoint_class('POST', '/settings/_search'))
+
+    def test_limit(self):
+        transport = FakeTransport([20, 0])
+        limited = RateLimitTransport(transport, {'delete': '20', 'burst': '2', 'pending_tasks': '10', 'pending_interval': '0.05'})
+
+        async def run():
+            await limited.perform_request('GET', '/a/_settings')
+            await asyncio.gather(*[limited.perform_request('DELETE', '/i%d' % i) for i in range(4)])
+
+        start = time.monotonic()
+        asyncio.run(run())
+        # two tokens in the burst, two waited for at 20 per second, and a wait for the pending tasks
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(transport.requests[0:3], [('GET', '/a/_settings'), ('GET', '/_cluster/pending_tasks'), ('GET', '/_cluster/pending_tasks')])
+        self.assertEqual(len([r for r in transport.requests if r[0] == 'DELETE']), 4)
@@ -0,0 +1,171 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+import eslib
+from types import SimpleNamespace
+from elasticsearch.exceptions import TransportError
+from eslib import context
+from eslib.ilm import IlmReport
+from eslib.indices import IndiciesDelete
+from eslib.running import Running
+from eslib.verb import RepeterVerb
+from eslib.asynctransport import AsyncTransport
+from eslib.pycurlconnection import PyCurlConnection
+from tests import TestCaseProvider
+from tests.standin import StandIn
+
+
+class StandInTestCase(TestCaseProvider):
+    """
+    The escmd verbs, against the stand-in server instead of a real cluster
+    """
+
+    standin_args = {'nodes': 3, 'indices': 30, 'shards': 2}
+
+    def setUp(self):
+        self.standin = StandIn(**self.standin_args).start()
+        # The loop of the previous test was closed by disconnect
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.ctx = context.Context(url=self.standin.url, sniff=False, debug=False, transport_class=AsyncTransport,
+                                   connection_class=PyCurlConnection, typehandling='deprecated')
+        self.ctx.connect()
+
+    def tearDown(self):
+        super().tearDown()
+        self.standin.stop()
+
+    def test_cluster(self):
+        health = self.ctx.perform_query(self.ctx.escnx.cluster.health())
+        self.assertEqual(3, health['number_of_nodes'])
+        self.assertEqual(60, health['active_primary_shards'])
+        nodes = self.ctx.perform_query(self.ctx.escnx.nodes.info(filter_path='nodes.*.name'))
+        self.assertEqual(['node-0', 'node-1', 'node-2'], sorted(n['name'] for n in nodes['nodes'].values()))
+
+    def test_write_settings(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        running = self._run_action(dispatcher, 'writesettings', object_options={'index_name': 'logs-*'},
+                                   object_args=['index.refresh_interval=5s'])
+        summary = [r for r in running.result if isinstance(r, str)]
+        self.assertEqual(['15 changed, 15 unchanged, 0 failed'], summary)
+        self.assertEqual(1, self.standin.requests['put_settings'])
+
+    def test_delete_chunked(self):
+        # --inflight doesn't apply to the chunks
+        self.ctx.current_config['api']['in_flight'] = 8
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        start = time.monotonic()
+        with patch.object(IndiciesDelete, 'max_url_length', 60):
+            running = self._run_action(dispatcher, 'delete', object_options={'index_name': 'logs-*'},
+                                       object_args=['-c', '--pause', '0.05'])
+            results = list(running.result)
+        self.assertGreater(time.monotonic() - start, 0.24)
+        self.assertEqual(30, len(results))
+        self.assertEqual(6, self.standin.requests['indices_delete'])
+        self.assertEqual(0, len(self.standin.cluster.indices))
+
+    def test_plan_write_settings(self):
+        # The settings are read to know what would change, only the update is planned
+        self.ctx.disconnect()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.ctx = context.Context(url=self.standin.url, sniff=False, debug=False, transport_class=AsyncTransport,
+                                   connection_class=PyCurlConnection, typehandling='deprecated', plan=True)
+        self.ctx.connect()
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+        running = self._run_action(dispatcher, 'writesettings', object_options={'index_name': 'logs-*'},
+                                   object_args=['index.refresh_interval=10s'])
+        list(running.result)
+        self.assertIn('planned: PUT /{}/_settings 1 requests for 30 names', list(self.ctx.plan.lines()))
+        self.assertEqual(1, self.standin.requests['get_settings'])
+        self.assertNotIn('put_settings', self.standin.requests)
+
+    def test_delete_chunked_missing(self):
+        dispatcher = eslib.dispatchers['index']()
+        dispatcher.api = self.ctx
+
+        async def get_elements(verb, running):
+            return list(running.object.items()) + [('gone', {})]
+        with patch.object(IndiciesDelete, 'get_elements', get_elements):
+            running = self._run_action(dispatcher, 'delete', object_options={'index_name': 'logs-*'}, object_args=['-c'])
+            results = list(running.result)
+        failed = [r for r in results if isinstance(r, Exception)]
+        self.assertEqual(30, len(results) - len(failed))
+        self.assertEqual(1, len(failed))
+        self.assertIn('gone', str(failed[0]))
+        self.assertEqual(0, len(self.standin.cluster.indices))
+
+    def test_ilm_report(self):
+        dispatcher = eslib.dispatchers['ilm']()
+        dispatcher.api = self.ctx
+        with patch.object(IlmReport, 'max_url_length', 60):
+            running = self._run_action(dispatcher, 'report')
+        self.assertEqual(30, sum(running.result['steps'].values()))
+        # 30 names of 11 characters, 5 by request
+        self.assertEqual(6, self.standin.requests['ilm_explain'])
+
+    def test_fallback_bounded(self):
+        class Refused(RepeterVerb):
+            batched = True
+            in_flight = 4
+            max_url_length = 50
+            active = 0
+            max_active = 0
+
+            async def batch_action(self, elements, running):
+                raise TransportError(400, 'illegal_argument_exception', {})
+
+            async def action(self, element, running):
+                self.active += 1
+                self.max_active = max(self.active, self.max_active)
+                try:
+                    return await self.api.escnx.cluster.health()
+                finally:
+                    self.active -= 1
+
+        verb = Refused(SimpleNamespace(api=self.ctx))
+        running = Running(verb, object={'index-%03d' % i: {} for i in range(100)})
+
+        async def run():
+            return [r async for r in await verb.execute(running)]
+        results = self.ctx.perform_query(run())
+        self.assertEqual(100, len(results))
+        self.assertEqual(4, verb.max_active)
+
+    def test_ordered_cancelled(self):
+        self.ctx.current_config['api']['ordered'] = True
+
+        class Slow(RepeterVerb):
+            in_flight = 4
+            tasks = []
+
+            async def action(self, element, running):
+                self.tasks.append(asyncio.current_task())
+                await asyncio.sleep(3600)
+
+        verb = Slow(SimpleNamespace(api=self.ctx))
+        running = Running(verb, object={'index-%d' % i: {} for i in range(10)})
+
+        async def run():
+            consumer = asyncio.ensure_future(verb.execute(running))
+            results = await consumer
+            reader = asyncio.ensure_future(results.__anext__())
+            await asyncio.sleep(0.1)
+            # Interrupted while it waits for the first action
+            reader.cancel()
+            await asyncio.wait((reader, ))
+            await results.aclose()
+        self.ctx.perform_query(run())
+        self.assertEqual(4, len(Slow.tasks))
+        self.assertTrue(all(t.done() for t in Slow.tasks))
+
+    def test_throttled(self):
+        self.standin.throttle_rate = 1.0
+        with self.assertRaises(TransportError) as raised:
+            self.ctx.perform_query(self.ctx.escnx.cluster.health())
+        self.assertEqual(429, raised.exception.status_code)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import eslib
 
 import tests
 import os
+import tempfile
 from pathlib import Path
 
 class TemplateTestCase(tests.TestCaseProvider):
@@ -29,3 +30,18 @@ class TemplateTestCase(tests.TestCaseProvider):
         print(vars(running))
         running = self._run_action(dispatcher, 'delete', object_options={'template_name': 'logs'})
         print(vars(running))
+
+    def test_sync(self):
+        dispatcher = eslib.dispatchers['template']()
+        dispatcher.api = self.ctx
+        name = 'sync-%s' % id(self)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, name + '.yaml'), 'w') as template_file:
+                template_file.write('index_patterns: ["%s-*"]\nsettings:\n  number_of_shards: 1\n' % name)
+            try:
+                for expected in ('created', 'unchanged'):
+                    running = self._run_action(dispatcher, 'sync', object_args=['-d', directory])
+                    results = [j for j in running.result if not isinstance(j, str) and j[0][0] == name]
+                    self.assertEqual([expected], [j[1]['status'] for j in results])
+            finally:
+                self._run_action(dispatcher, 'delete', object_options={'template_name': name})